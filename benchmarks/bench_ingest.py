@@ -0,0 +1,146 @@
+"""
+End-to-end ingest load test against the bundled fake SenseAI server.
+
+Starts sensevis._fakeserver on local ports, registers and subscribes `--sensors` sensors
+through the real IngestService / subscribe_many paths, renders every update (on the event
+loop, or on a RenderScheduler with --render-workers) and reports messages/sec received,
+frames/sec rendered, unchanged frames, drops, reconnects and two latencies to the frame
+being rendered and PNG-encoded: message -> frame, from the fake server stamping the message
+(payload.sent_at, wall clock) so time on the wire is included, and ingest -> frame, from
+IngestService receiving it. Updates whose bright pixels didn't change produce no new PNG and
+are counted as unchanged, not as rendered frames:
+
+    python benchmarks/bench_ingest.py --sensors 100 --rate 5 --duration 10
+    python benchmarks/bench_ingest.py --sensors 100 --rate 20 --render-workers 4 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+from sensevis._fakeserver import FakeSenseAI  # noqa: E402
+from sensevis._post import IngestService  # noqa: E402
+from sensevis._scheduler import RenderScheduler  # noqa: E402
+from sensevis._send import subscribe_many  # noqa: E402
+from sensevis._upscaler import IncrementalRenderer, encode_frame  # noqa: E402
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+
+async def run_load(sensors=10, rate=5.0, duration=10.0, people=3, render_workers=None, disconnect_every=None,
+                   compress_level=1, seed=0):
+    names = [f'LoadTest-{i}' for i in range(sensors)]
+    renderers = {name: IncrementalRenderer(rng=random.Random(i)) for i, name in enumerate(names)}
+    latencies = []  # seconds, message received by ingest -> frame encoded
+    message_latencies = []  # seconds, message sent by the server -> frame encoded
+    received = unchanged = 0
+
+    def render(sensor_name, update):
+        # Own renderer per sensor: with --render-workers sensors render on different threads
+        _, upscaled, changed = renderers[sensor_name].render(sensor_name, update.centroids)
+        png = encode_frame(upscaled, 'png', upscaled=False, compress_level=compress_level) if changed else None
+        return update, png
+
+    def rendered(sensor_name, result):
+        nonlocal unchanged
+        update, png = result
+        if png is None:
+            unchanged += 1
+        else:
+            latencies.append(time.monotonic() - update.received_at)
+            if update.sent_at is not None:
+                message_latencies.append(time.time() - update.sent_at)
+
+    async with FakeSenseAI(rate, people, disconnect_every=disconnect_every, seed=seed) as fake:
+        ingest = IngestService(names, ws_url=fake.ws_url, backoff_initial=0.05, backoff_max=1.0)
+        scheduler = RenderScheduler(render, rendered, max_in_flight=render_workers) if render_workers else None
+
+        async def consume():
+            nonlocal received
+            async for update in ingest.updates():
+                received += 1
+                if scheduler is not None:
+                    scheduler.submit(update.sensor_name, update)
+                else:
+                    rendered(update.sensor_name, render(update.sensor_name, update))
+
+        async with ingest:
+            await asyncio.wait_for(asyncio.gather(*(ingest.connected[name].wait() for name in names)), 30)
+            subscribe_start = time.monotonic()
+            results = await subscribe_many(names, api_url=fake.api_url, concurrency=20)
+            subscribe_time = time.monotonic() - subscribe_start
+            consumer = asyncio.create_task(consume())
+            start = time.monotonic()
+            await asyncio.sleep(duration)
+            elapsed = time.monotonic() - start
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+            if scheduler is not None:
+                await scheduler.close(drain=False)
+
+    ordered = sorted(latencies)
+    message_ordered = sorted(message_latencies)
+    return {
+        'sensors': sensors,
+        'rate_per_sensor': rate,
+        'people': people,
+        'render_workers': render_workers,
+        'duration_s': elapsed,
+        'subscribed': sum(result.ok for result in results),
+        'subscribe_s': subscribe_time,
+        'messages_sent': fake.stats.messages_sent,
+        'messages_received': received,
+        'messages_per_s': received / elapsed,
+        'frames_rendered': len(latencies),
+        'frames_per_s': len(latencies) / elapsed,
+        'frames_unchanged': unchanged,
+        'frames_dropped': scheduler.stats.dropped if scheduler is not None else 0,
+        'reconnects': sum(ingest.reconnects.values()),
+        'server_late_ticks': fake.stats.late_ticks,
+        'message_to_frame_mean_ms': statistics.fmean(message_ordered) * 1000 if message_ordered else None,
+        'message_to_frame_p50_ms': percentile(message_ordered, 0.5) * 1000 if message_ordered else None,
+        'message_to_frame_p95_ms': percentile(message_ordered, 0.95) * 1000 if message_ordered else None,
+        'message_to_frame_p99_ms': percentile(message_ordered, 0.99) * 1000 if message_ordered else None,
+        'message_to_frame_max_ms': message_ordered[-1] * 1000 if message_ordered else None,
+        'ingest_to_frame_mean_ms': statistics.fmean(ordered) * 1000 if ordered else None,
+        'ingest_to_frame_p50_ms': percentile(ordered, 0.5) * 1000 if ordered else None,
+        'ingest_to_frame_p95_ms': percentile(ordered, 0.95) * 1000 if ordered else None,
+        'ingest_to_frame_p99_ms': percentile(ordered, 0.99) * 1000 if ordered else None,
+        'ingest_to_frame_max_ms': ordered[-1] * 1000 if ordered else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sensors', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=5.0, help='messages per second per sensor')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to measure for')
+    parser.add_argument('--people', type=int, default=3, help='synthetic people per sensor')
+    parser.add_argument('--render-workers', type=int, default=None,
+                        help='render on a RenderScheduler with N workers instead of on the event loop')
+    parser.add_argument('--disconnect-every', type=int, default=None,
+                        help='have the server drop each sensor\'s socket every N messages')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.sensors, args.rate, args.duration, args.people, args.render_workers,
+                                  args.disconnect_every))
+    for key, value in result.items():
+        print(f'{key:>24}: {value:.2f}' if isinstance(value, float) else f'{key:>24}: {value}')
+    if args.output:
+        report = {'python': platform.python_version(), 'cpus': os.cpu_count(), 'results': result}
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
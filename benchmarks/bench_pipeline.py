@@ -0,0 +1,178 @@
+"""
+Render/I-O benchmark for the image generation pipeline.
+
+Times each stage (base image load, centroid mapping, halo rings, upscale, PNG encode,
+file write) on synthetic workloads of 0..200 people, plus end-to-end runs of
+generate_image_from_centroids and the CSV replay in main(). Results are written as JSON
+so runs can be compared:
+
+    python benchmarks/bench_pipeline.py --output before.json
+    python benchmarks/bench_pipeline.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import PIL
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+from sensevis import _upscaler  # noqa: E402
+
+PEOPLE = (0, 1, 5, 20, 50, 100, 200)
+
+
+def timed(fn, frames):
+    """Run fn() `frames` times; return per-call timings in milliseconds."""
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarise(stage, people, samples):
+    ordered = sorted(samples)
+    return {
+        'stage': stage,
+        'people': people,
+        'frames': len(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'min_ms': ordered[0],
+    }
+
+
+def synthetic_centroids(rng, people):
+    return [(rng.uniform(1, 32), rng.uniform(1, 24)) for _ in range(people)]
+
+
+def bench_stages(frames, workdir):
+    rng = random.Random(0)
+    results = []
+
+    base_path = _upscaler.BASE_IMAGE_PATH
+    results.append(summarise('base_load', 0, timed(lambda: _upscaler.BaseImage(base_path).frame(), frames)))
+    base = _upscaler.BaseImage(base_path)
+    results.append(summarise('base_load_cached', 0, timed(base.frame, frames)))
+
+    for people in PEOPLE:
+        centroids = synthetic_centroids(rng, people)
+        background = base.frame()
+        sx, sy = _upscaler.map_centroids(centroids) if people else (np.empty(0), np.empty(0))
+        cells = _upscaler.bright_cells(sx, sy)
+        layout = _upscaler.halo_layout(*cells)
+        frame = background.copy()
+        _upscaler.compose(frame, layout)
+        upscaled = _upscaler.upscale(frame)
+        png = _upscaler.encode_frame(upscaled, 'png', upscaled=False, compress_level=6)
+        out_path = workdir / f'bench_{people}.png'
+
+        results.append(summarise('centroid_mapping', people, timed(
+            lambda: _upscaler.bright_cells(*_upscaler.map_centroids(centroids)) if people else None, frames)))
+        whole = [(round(x), round(y)) for x, y in centroids]
+        results.append(summarise('centroid_lookup', people, timed(
+            lambda: _upscaler.centroid_cells(whole) if people else None, frames)))
+        results.append(summarise('halo_rings', people, timed(
+            lambda: _upscaler.compose(background.copy(), _upscaler.halo_layout(*cells)), frames)))
+        results.append(summarise('upscale', people, timed(lambda: _upscaler.upscale(frame), frames)))
+        results.append(summarise('png_encode', people, timed(
+            lambda: _upscaler.encode_frame(upscaled, 'png', upscaled=False, compress_level=6), frames)))
+        results.append(summarise('png_encode_fast', people, timed(
+            lambda: _upscaler.encode_frame(upscaled, 'png', upscaled=False, compress_level=1), frames)))
+        results.append(summarise('file_write', people, timed(lambda: out_path.write_bytes(png), frames)))
+    return results
+
+
+def bench_end_to_end(frames, workdir):
+    rng = random.Random(1)
+    results = []
+    # The legacy entry points write into OUTPUT_DIR; point it at the workdir for this run only
+    output_dir = _upscaler.OUTPUT_DIR
+    _upscaler.OUTPUT_DIR = workdir / 'bounding_box_gen'
+    try:
+        for people in PEOPLE:
+            centroids = synthetic_centroids(rng, people)
+            results.append(summarise('generate_image_from_centroids', people, timed(
+                lambda: _upscaler.generate_image_from_centroids(centroids, 'bench'), frames)))
+
+        csv_path = workdir / 'centroid.csv'
+        with csv_path.open('w') as fh:
+            for _ in range(frames):
+                people = rng.choice(PEOPLE[:5])
+                xs = ','.join(f'{rng.uniform(1, 100):.2f}' for _ in range(people))
+                ys = ','.join(f'{rng.uniform(1, 100):.2f}' for _ in range(people))
+                fh.write(f'{people},"{{{xs}}}","[{ys}]"\n')
+        start = time.perf_counter()
+        _upscaler.main(csv_path)
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        _upscaler.OUTPUT_DIR = output_dir
+    results.append({'stage': 'csv_main', 'people': None, 'frames': frames, 'mean_ms': elapsed / frames,
+                    'p50_ms': None, 'p95_ms': None, 'min_ms': None, 'total_ms': elapsed})
+    return results
+
+
+def compare(results, previous_path, threshold):
+    previous = {(r['stage'], r['people']): r for r in json.loads(Path(previous_path).read_text())['results']}
+    regressions = 0
+    print(f'\n{"stage":32} {"people":>6} {"before":>10} {"after":>10} {"ratio":>7}')
+    for r in results:
+        old = previous.get((r['stage'], r['people']))
+        if old is None or not old['mean_ms']:
+            continue
+        ratio = r['mean_ms'] / old['mean_ms']
+        flag = '  <-- slower' if ratio > 1 + threshold else ''
+        regressions += bool(flag)
+        print(f'{r["stage"]:32} {str(r["people"]):>6} {old["mean_ms"]:10.3f} {r["mean_ms"]:10.3f} {ratio:7.2f}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=50, help='frames per workload')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown ratio reported as a regression')
+    parser.add_argument('--skip-end-to-end', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        results = bench_stages(args.frames, workdir)
+        if not args.skip_end_to_end:
+            results += bench_end_to_end(args.frames, workdir)
+
+    report = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'frames': args.frames,
+        },
+        'results': results,
+    }
+    for r in results:
+        print(f'{r["stage"]:32} people={str(r["people"]):>4}  mean {r["mean_ms"]:8.3f} ms')
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,2 +1,29 @@
-from .readdata import SenseScraper
-from .generateimage import ImageGenerator
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+__all__ = ['SenseScraper', 'ImageGenerator']
+
+# Public name -> submodule defining it. Submodules (and numpy, PIL, httpx, websockets behind
+# them) are only imported when the name is first used, so `import sensevis` stays cheap.
+_LAZY = {
+    'SenseScraper': 'readdata',
+    'ImageGenerator': 'generateimage',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import importlib
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .generateimage import ImageGenerator
+    from .readdata import SenseScraper
@@ -0,0 +1,128 @@
+import struct
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ._upscaler import BLOCK_H, BLOCK_W, UPSCALED_H, UPSCALED_W, upscale
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+FORMATS = {'.png': 'APNG', '.apng': 'APNG', '.gif': 'GIF', '.webp': 'WEBP'}
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class SequenceWriter:
+    """
+    Collects rendered 10x8 frames into one animated file, upscaling only at encode time.
+
+    APNG output is streamed: each frame is upscaled, compressed and written as soon as the
+    next differing frame arrives, so only the last frame is held in memory. Runs of
+    identical frames become a single frame with a longer delay. GIF and WebP go through
+    PIL, which needs the whole sequence at once, so for those only the small frames are
+    kept (GRID_W * GRID_H * 3 bytes each) and upscaled lazily while saving.
+    """
+
+    def __init__(self, path, fps: float = 5.0, format: str | None = None, loop: int = 0,
+                 block_size: Tuple[int, int] = (BLOCK_W, BLOCK_H),
+                 output_size: Tuple[int, int] | None = (UPSCALED_W, UPSCALED_H), compress_level: int = 6):
+        self.path = Path(path)
+        self.format = (format or FORMATS.get(self.path.suffix.lower(), '')).upper()
+        if self.format not in ('APNG', 'GIF', 'WEBP'):
+            raise ValueError(f'Unsupported animation format for {self.path}')
+        self.frame_ms = max(1, round(1000 / fps))
+        self.loop = loop
+        self.block_size = block_size
+        self.output_size = output_size
+        self.compress_level = compress_level
+        self.frames_written = 0
+        self._pending: np.ndarray | None = None
+        self._pending_ms = 0
+        self._small: List[Tuple[bytes, Tuple[int, ...], int]] = []  # GIF/WebP: (raw 10x8 bytes, shape, duration)
+        self._file = None
+        self._seq = 0
+        self._size: Tuple[int, int] | None = None
+        self._actl_offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, frame: np.ndarray):
+        """Add a GRID_H x GRID_W x 3 frame shown for 1/fps seconds."""
+        if self._pending is not None and np.array_equal(frame, self._pending) and self._pending_ms + self.frame_ms <= 0xFFFF:
+            self._pending_ms += self.frame_ms
+            return
+        self._flush()
+        self._pending = np.array(frame, dtype=np.uint8)
+        self._pending_ms = self.frame_ms
+
+    def close(self):
+        self._flush()
+        if self.format == 'APNG':
+            if self._file is None:
+                return
+            self._file.write(_chunk(b'IEND', b''))
+            # Frame count is only known now; patch it into the acTL chunk written up front
+            self._file.seek(self._actl_offset)
+            self._file.write(_chunk(b'acTL', struct.pack('>II', self.frames_written, self.loop)))
+            self._file.close()
+            self._file = None
+        elif self._small:
+            self._save_with_pil()
+            self._small = []
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        if self.format == 'APNG':
+            self._write_apng_frame(upscale(self._pending, self.block_size, self.output_size), self._pending_ms)
+        else:
+            self._small.append((self._pending.tobytes(), self._pending.shape, self._pending_ms))
+        self.frames_written += 1
+        self._pending = None
+
+    def _write_apng_frame(self, image: np.ndarray, duration_ms: int):
+        height, width = image.shape[:2]
+        if self._file is None:
+            self._size = (width, height)
+            self._file = open(self.path, 'wb')
+            self._file.write(PNG_SIGNATURE)
+            self._file.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+            self._actl_offset = self._file.tell()
+            self._file.write(_chunk(b'acTL', struct.pack('>II', 0, self.loop)))
+        elif (width, height) != self._size:
+            raise ValueError('All frames in a sequence must have the same size')
+
+        # fcTL: sequence, size, offset, delay (ms / 1000), dispose none, blend source
+        self._file.write(_chunk(b'fcTL', struct.pack('>IIIIIHHBB', self._seq, width, height, 0, 0,
+                                                     duration_ms, 1000, 0, 0)))
+        self._seq += 1
+        # Each scanline is prefixed with filter type 0 (None)
+        rows = np.zeros((height, 1 + width * 3), dtype=np.uint8)
+        rows[:, 1:] = image.reshape(height, -1)
+        data = zlib.compress(rows.tobytes(), self.compress_level)
+        if self.frames_written == 0:
+            self._file.write(_chunk(b'IDAT', data))
+        else:
+            self._file.write(_chunk(b'fdAT', struct.pack('>I', self._seq) + data))
+            self._seq += 1
+        self._file.flush()
+
+    def _save_with_pil(self):
+        def frames():
+            for raw, shape, _ in self._small:
+                small = np.frombuffer(raw, dtype=np.uint8).reshape(shape)
+                yield Image.fromarray(upscale(small, self.block_size, self.output_size))
+
+        images = frames()
+        first = next(images)
+        durations = [duration for _, _, duration in self._small]
+        first.save(self.path, format=self.format, save_all=True, append_images=images,
+                   duration=durations, loop=self.loop)
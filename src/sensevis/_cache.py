@@ -0,0 +1,157 @@
+import hashlib
+import io
+import os
+import random
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from ._snapshot import atomic_write
+from ._upscaler import BaseImage, _default_base, bright_key, centroid_cells, compose, halo_layout, is_blank, save_upscaled
+
+# Disk entries are <32 hex digit key>.png; nothing else in disk_dir is counted or pruned
+DISK_PATTERN = '[0-9a-f]' * 32 + '.png'
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+
+class RenderCache:
+    """
+    LRU cache of encoded 640x480 PNGs keyed on the canonical bright-pixel set and person
+    colours (plus the background, RenderConfig and seed), so recurring occupancy layouts are served
+    without rendering or encoding. Bounded by entry count and total bytes; with `disk_dir`
+    entries are also kept on disk as <digest>.png and survive restarts. The disk tier is capped
+    at `disk_max_bytes` (None for unbounded): past it, the least recently used of its own
+    <digest>.png files are deleted until it is back under three quarters of the cap; other files
+    in `disk_dir` are left alone.
+
+    Ring1 colours are drawn from a Random seeded by the layout digest and `seed`, so a given
+    layout always renders the same image and cache hits are exact. seed=None keeps them random
+    per render (hits then replay whatever the first render drew).
+    """
+
+    def __init__(self, maxsize: int = 256, max_bytes: int | None = 64 * 1024 * 1024, disk_dir=None,
+                 seed: int | None = 0, base: BaseImage | None = None, compress_level: int = 6,
+                 disk_max_bytes: int | None = 256 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(p.stat().st_size for p in self._disk_files())
+        self.seed = seed
+        self.base = base or _default_base
+        self.compress_level = compress_level
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._background = None
+        self._background_digest = b''
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, centroids) -> str:
+        """Hex digest identifying the rendered image for these centroids."""
+        background = self.base.frame()
+        if background is not self._background:
+            self._background = background
+            self._background_digest = hashlib.blake2b(background.tobytes(), digest_size=8).digest()
+        if is_blank(centroids):
+            layout_key = b''
+        else:
+            layout_key = bright_key(*centroid_cells(centroids, self.base.config), self.base.config)
+        digest = hashlib.blake2b(layout_key, digest_size=16)
+        digest.update(self._background_digest)
+        digest.update(self.base.config.key)
+        digest.update(repr(self.seed).encode())
+        return digest.hexdigest()
+
+    def png(self, centroids) -> bytes:
+        """Encoded PNG for these centroids, rendered at most once per layout."""
+        key = self.key(centroids)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return data
+
+        path = self.disk_dir / f'{key}.png' if self.disk_dir is not None else None
+        if path is not None and path.exists():
+            data = path.read_bytes()
+            os.utime(path)  # mtime is the disk tier's recency
+            self.stats.disk_hits += 1
+        else:
+            data = self._render(centroids, key)
+            self.stats.misses += 1
+            if path is not None:
+                atomic_write(path, data)
+                self._disk_bytes += len(data)
+                if self.disk_max_bytes is not None and self._disk_bytes > self.disk_max_bytes:
+                    self._prune_disk()
+        self._store(key, data)
+        return data
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _prune_disk(self):
+        # Rescan rather than trust the running total: other processes may share the directory
+        files = []
+        for p in self._disk_files():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, p))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 3 // 4
+        for _, size, p in files:
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._disk_bytes = total
+
+    def _disk_files(self) -> List[Path]:
+        return list(self.disk_dir.glob(DISK_PATTERN))
+
+    def _render(self, centroids, key) -> bytes:
+        config = self.base.config
+        frame = np.array(self.base.frame())
+        if not is_blank(centroids):
+            rng = random.Random(int(key, 16) ^ self.seed) if self.seed is not None else None
+            compose(frame, halo_layout(*_canonical_cells(*centroid_cells(centroids, config), config), config), rng)
+        buf = io.BytesIO()
+        save_upscaled(frame, buf, format='PNG', block_size=config.block_size, output_size=config.output_size,
+                      compress_level=self.compress_level)
+        return buf.getvalue()
+
+    def _store(self, key, data):
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._entries and (len(self._entries) > self.maxsize
+                                 or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+
+def _canonical_cells(xs, ys, colors, config):
+    # One entry per bright cell (last write wins, as in bright_key), sorted by cell: the
+    # ring1 colours are drawn in bright-pixel order, which must not depend on centroid order
+    flat = ys * config.grid_w + xs
+    _, last = np.unique(flat[::-1], return_index=True)
+    keep = len(flat) - 1 - last
+    return xs[keep], ys[keep], colors[keep]
@@ -0,0 +1,214 @@
+import random
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from ._upscaler import (BaseImage, RenderConfig, _default_base, centroid_cells, compose, encode_frame, halo_layout,
+                        is_blank)
+
+
+@dataclass
+class SensorPlacement:
+    sensor_name: str
+    x: int  # floor-grid column of the sensor's top-left cell (after rotation)
+    y: int  # floor-grid row of the sensor's top-left cell
+    rotation: int = 0  # clockwise, in degrees; a multiple of 90
+
+
+class FloorLayout:
+    """
+    Where each sensor's grid sits on one floor grid. Every placement gets index tables mapping
+    its own (x, y) cells to floor cells, so placing a frame's bright pixels is one gather.
+    Placements must not overlap. The floor is sized to fit every placement unless `size`
+    (w, h) is given.
+    """
+
+    def __init__(self, placements: Iterable[SensorPlacement], config: RenderConfig | None = None,
+                 size: Tuple[int, int] | None = None):
+        self.config = config or _default_base.config
+        self.placements: Dict[str, SensorPlacement] = {}
+        self.footprints: Dict[str, Tuple[int, int, int, int]] = {}  # (left, top, right, bottom) in floor cells
+        self._cells: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        grid_w, grid_h = self.config.grid_size
+        width = height = 0
+        for placement in placements:
+            if placement.rotation % 90:
+                raise ValueError(f'{placement.sensor_name}: rotation must be a multiple of 90, got {placement.rotation}')
+            if placement.x < 0 or placement.y < 0:
+                raise ValueError(f'{placement.sensor_name}: offset must not be negative')
+            if placement.sensor_name in self.placements:
+                raise ValueError(f'{placement.sensor_name} is placed twice')
+            # Rotate a grid of flat cell indices, then read back where each cell ended up
+            rotated = self.rotate(np.arange(grid_w * grid_h).reshape(grid_h, grid_w), placement.rotation)
+            footprint = (placement.x, placement.y, placement.x + rotated.shape[1], placement.y + rotated.shape[0])
+            for other, (left, top, right, bottom) in self.footprints.items():
+                if footprint[0] < right and left < footprint[2] and footprint[1] < bottom and top < footprint[3]:
+                    raise ValueError(f'{placement.sensor_name} overlaps {other}')
+            rows, cols = np.indices(rotated.shape)
+            floor_x = np.empty(grid_w * grid_h, dtype=np.intp)
+            floor_y = np.empty(grid_w * grid_h, dtype=np.intp)
+            floor_x[rotated.ravel()] = cols.ravel() + placement.x
+            floor_y[rotated.ravel()] = rows.ravel() + placement.y
+            self.placements[placement.sensor_name] = placement
+            self.footprints[placement.sensor_name] = footprint
+            self._cells[placement.sensor_name] = (floor_x, floor_y)
+            width = max(width, footprint[2])
+            height = max(height, footprint[3])
+        self.size = tuple(size) if size is not None else (width, height)
+        if self.size[0] < width or self.size[1] < height:
+            raise ValueError(f'floor size {self.size} does not fit the placements ({width}, {height})')
+
+    @staticmethod
+    def rotate(grid: np.ndarray, rotation: int) -> np.ndarray:
+        """Rotate a (h, w, ...) array clockwise by `rotation` degrees."""
+        return np.rot90(grid, k=-(rotation // 90) % 4)
+
+    def to_floor(self, sensor_name, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Floor-grid cells for cells (xs, ys) of a sensor's own grid."""
+        floor_x, floor_y = self._cells[sensor_name]
+        flat = ys * self.config.grid_w + xs
+        return floor_x[flat], floor_y[flat]
+
+
+@dataclass
+class CompositeStats:
+    renders: int = 0
+    tiles_encoded: int = 0
+    tiles_skipped: int = 0  # tiles left as they were because nothing in them changed
+
+
+class CompositeRenderer:
+    """
+    Renders every sensor of a FloorLayout into one floor-sized canvas.
+
+    `update()` stores a sensor's latest centroids; `render()` maps every sensor's bright pixels
+    onto the floor grid and computes the halos for the whole floor in a single pass, so halos
+    spread across neighbouring sensors. Like IncrementalRenderer, only cells whose halo footprint
+    changed are repainted, and the canvas is split into tiles: only tiles containing a repainted
+    cell are re-encoded. By default the floor is cut along every edge of every placement's
+    (rotated) footprint, so each sensor is covered by whole tiles (exactly one when the sensors
+    line up in a grid); with `tile_size` it is cut into uniform tiles of that many floor cells.
+    Person colours still fade with distance from the centre of each sensor's own room.
+    """
+
+    def __init__(self, layout: FloorLayout, base: BaseImage | None = None, rng: random.Random | None = None,
+                 tile_size: Tuple[int, int] | None = None, compress_level: int = 1):
+        self.layout = layout
+        if base is None:
+            base = _default_base if layout.config is _default_base.config else BaseImage(config=layout.config)
+        self.base = base
+        if self.base.config.grid_size != layout.config.grid_size:
+            raise ValueError('base image and layout use different grid sizes')
+        self.rng = rng
+        self.compress_level = compress_level
+        config = layout.config
+        floor_w, floor_h = layout.size
+        block_w, block_h = config.block_size
+        # Centroids are mapped with the sensor config, so the floor needs no coordinate range
+        self.floor_config = RenderConfig((floor_w, floor_h), None, (floor_w * block_w, floor_h * block_h),
+                                         config.palette)
+        self.tile_size = tuple(tile_size) if tile_size is not None else None
+        if self.tile_size is not None:
+            tile_w, tile_h = self.tile_size
+            x_edges, y_edges = list(range(0, floor_w, tile_w)), list(range(0, floor_h, tile_h))
+        else:
+            x_edges = [edge for left, _, right, _ in layout.footprints.values() for edge in (left, right)]
+            y_edges = [edge for _, top, _, bottom in layout.footprints.values() for edge in (top, bottom)]
+        # Tile boundaries in floor cells; tile (column, row) spans x_edges[column]:x_edges[column + 1]
+        self.x_edges = sorted(set(x_edges) | {0, floor_w})
+        self.y_edges = sorted(set(y_edges) | {0, floor_h})
+        self.tiles_shape = (len(self.x_edges) - 1, len(self.y_edges) - 1)  # (columns, rows)
+        self.tiles: Dict[Tuple[int, int], bytes] = {}  # (column, row) -> latest PNG
+        self.stats = CompositeStats()
+        self._centroids: Dict[str, object] = {}
+        self._background = None
+        self._source = None
+        self._layout = None
+        self.frame = None
+        self.canvas = None
+
+    def update(self, sensor_name, centroids):
+        if sensor_name not in self.layout.placements:
+            raise KeyError(f'{sensor_name} is not in the floor layout')
+        self._centroids[sensor_name] = centroids
+
+    def render(self) -> List[Tuple[int, int]]:
+        """Repaint what changed since the last render; returns the (column, row) tiles re-encoded."""
+        background = self._floor_background()
+        xs, ys, colors = [], [], []
+        for name in self.layout.placements:
+            centroids = self._centroids.get(name)
+            if centroids is None or is_blank(centroids):
+                continue
+            cell_x, cell_y, cell_colors = centroid_cells(centroids, self.layout.config)
+            floor_x, floor_y = self.layout.to_floor(name, cell_x, cell_y)
+            xs.append(floor_x)
+            ys.append(floor_y)
+            colors.append(cell_colors)
+        if xs:
+            xs, ys, colors = np.concatenate(xs), np.concatenate(ys), np.concatenate(colors)
+        else:
+            xs = ys = np.empty(0, dtype=np.intp)
+            colors = np.empty((0, 3), dtype=np.uint8)
+        layout = halo_layout(xs, ys, colors, self.floor_config)
+
+        if self._layout is None or self._source is not background:
+            self.frame = background.copy()
+            compose(self.frame, layout, self.rng)
+            self.canvas = self.floor_config.upscale(self.frame)
+            changed = np.ones(self.frame.shape[:2], dtype=bool)
+            self._source = background
+        else:
+            last = self._layout
+            changed = ((layout.layer != last.layer) | (layout.corner != last.corner)
+                       | ((layout.layer == 0) & (layout.color != last.color).any(axis=2)))
+            self.frame[changed] = background[changed]
+            compose(self.frame, layout, self.rng, changed)
+            block_w, block_h = self.floor_config.block_size
+            for gy, gx in zip(*np.nonzero(changed)):
+                self.canvas[gy * block_h:(gy + 1) * block_h, gx * block_w:(gx + 1) * block_w] = self.frame[gy, gx]
+        self._layout = layout
+        self.stats.renders += 1
+        return self._encode_tiles(changed)
+
+    def tile_bounds(self, column: int, row: int) -> Tuple[int, int, int, int]:
+        """(left, top, right, bottom) of a tile in canvas pixels."""
+        block_w, block_h = self.floor_config.block_size
+        return (self.x_edges[column] * block_w, self.y_edges[row] * block_h,
+                self.x_edges[column + 1] * block_w, self.y_edges[row + 1] * block_h)
+
+    def encode(self, format: str = 'png', **options):
+        """The whole floor canvas, in any format encode_frame supports."""
+        return encode_frame(self.canvas, format, upscaled=False, **options)
+
+    def _floor_background(self) -> np.ndarray:
+        source = self.base.frame()
+        if self._background is None or self._background[0] is not source:
+            floor_w, floor_h = self.layout.size
+            floor = np.zeros((floor_h, floor_w, 3), dtype=np.uint8)  # Uncovered floor stays black
+            for placement in self.layout.placements.values():
+                tile = self.layout.rotate(source, placement.rotation)
+                floor[placement.y:placement.y + tile.shape[0], placement.x:placement.x + tile.shape[1]] = tile
+            floor.flags.writeable = False
+            self._background = (source, floor)
+        return self._background[1]
+
+    def _encode_tiles(self, changed: np.ndarray) -> List[Tuple[int, int]]:
+        columns, rows = self.tiles_shape
+        encoded = []
+        for row in range(rows):
+            top, bottom = self.y_edges[row], self.y_edges[row + 1]
+            for column in range(columns):
+                key = (column, row)
+                dirty = changed[top:bottom, self.x_edges[column]:self.x_edges[column + 1]].any()
+                if key in self.tiles and not dirty:
+                    self.stats.tiles_skipped += 1
+                    continue
+                left, top, right, bottom = self.tile_bounds(column, row)
+                png = encode_frame(self.canvas[top:bottom, left:right], 'png', upscaled=False,
+                                   compress_level=self.compress_level)
+                self.tiles[key] = png
+                self.stats.tiles_encoded += 1
+                encoded.append(key)
+        return encoded
@@ -0,0 +1,131 @@
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+# Braces/brackets wrapping the position lists, e.g. "{12.5,40}" or "[3,7.25]"
+_STRIP_BRACKETS = str.maketrans('', '', '{}[]')
+
+
+@dataclass
+class RowDiagnostic:
+    row: int  # zero-based row index, the same idx used for output file names
+    reason: str  # 'short-row', 'bad-count', 'bad-token' or 'count-mismatch'
+    detail: str
+    # False for 'bad-token': the row is still rendered without the non-numeric tokens, as it always was
+    skipped: bool = True
+
+
+class CsvFrame(NamedTuple):
+    idx: int
+    xs: np.ndarray  # float64, one entry per person
+    ys: np.ndarray
+
+
+def parse_positions(pos_str: str) -> List[float]:
+    """Convert comma-separated positions (optionally wrapped in braces/brackets) to float list."""
+    vals: List[float] = []
+    for token in pos_str.translate(_STRIP_BRACKETS).split(','):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            vals.append(float(token))
+        except ValueError:
+            # Skip tokens that cannot be converted to float
+            continue
+    return vals
+
+
+def _token_count(pos_str: str) -> int:
+    return sum(1 for token in pos_str.translate(_STRIP_BRACKETS).split(',') if token.strip())
+
+
+def _convert_column(fields: List[str]):
+    """
+    Bulk-convert one position column of a chunk: join every row's tokens into a single
+    list and convert it in one numpy call. Returns (values, counts), or None if any token
+    is empty or not a number, in which case the caller falls back to per-row parsing.
+    """
+    cleaned = [f.translate(_STRIP_BRACKETS) for f in fields]
+    counts = np.array([c.count(',') + 1 if c.strip() else 0 for c in cleaned], dtype=np.intp)
+    joined = ','.join(c for c in cleaned if c.strip())
+    try:
+        values = np.array(joined.split(',') if joined else [], dtype=np.float64)
+    except ValueError:
+        return None
+    return values, counts
+
+
+def _parse_chunk(rows, on_diagnostic) -> List[CsvFrame]:
+    frames: List[CsvFrame] = []
+    diagnostics: List[RowDiagnostic] = []
+    good = []
+    for idx, row in rows:
+        if len(row) < 3:
+            diagnostics.append(RowDiagnostic(idx, 'short-row', f'expected 3 columns, got {len(row)}'))
+            continue
+        try:
+            num_people = int(row[0])
+        except ValueError:
+            diagnostics.append(RowDiagnostic(idx, 'bad-count', f'person count {row[0]!r} is not an integer'))
+            continue
+        good.append((idx, num_people, row[1], row[2]))
+
+    xcol = _convert_column([g[2] for g in good])
+    ycol = _convert_column([g[3] for g in good])
+    if xcol is None or ycol is None:
+        # Slow path: per-token parsing that skips anything that isn't a number
+        for idx, num_people, xfield, yfield in good:
+            xs, ys = parse_positions(xfield), parse_positions(yfield)
+            bad_tokens = len(xs) != _token_count(xfield) or len(ys) != _token_count(yfield)
+            if len(xs) != num_people or len(ys) != num_people:
+                detail = f'{num_people} people but {len(xs)} x and {len(ys)} y positions'
+                if bad_tokens:
+                    detail += f' after dropping non-numeric tokens in {xfield!r} / {yfield!r}'
+                diagnostics.append(RowDiagnostic(idx, 'count-mismatch', detail))
+                continue
+            if bad_tokens:
+                diagnostics.append(RowDiagnostic(idx, 'bad-token', f'non-numeric positions in {xfield!r} / {yfield!r}',
+                                                 skipped=False))
+            frames.append(CsvFrame(idx, np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64)))
+    else:
+        (xvals, xcounts), (yvals, ycounts) = xcol, ycol
+        xoffsets = np.concatenate(([0], np.cumsum(xcounts)))
+        yoffsets = np.concatenate(([0], np.cumsum(ycounts)))
+        for i, (idx, num_people, _, _) in enumerate(good):
+            if xcounts[i] != num_people or ycounts[i] != num_people:
+                diagnostics.append(RowDiagnostic(
+                    idx, 'count-mismatch', f'{num_people} people but {xcounts[i]} x and {ycounts[i]} y positions'))
+                continue
+            frames.append(CsvFrame(idx, xvals[xoffsets[i]:xoffsets[i + 1]], yvals[yoffsets[i]:yoffsets[i + 1]]))
+
+    if on_diagnostic is not None:
+        for diag in sorted(diagnostics, key=lambda d: d.row):
+            on_diagnostic(diag)
+    return frames
+
+
+def iter_frames(csv_path, chunk_rows: int = 4096,
+                on_diagnostic: Optional[Callable[[RowDiagnostic], None]] = None) -> Iterator[CsvFrame]:
+    """
+    Stream a centroid CSV (count, "{x1,x2,...}", "[y1,y2,...]") as CsvFrames, converting
+    positions `chunk_rows` rows at a time. Only one chunk is held in memory; frames are
+    yielded lazily in file order. Rows that can't be used are skipped and reported to
+    `on_diagnostic` as RowDiagnostics, one per row; blank lines are ignored. A row with
+    non-numeric tokens whose remaining positions still match its count is yielded without
+    them and reported as 'bad-token' with `skipped=False`.
+    """
+    with Path(csv_path).open(newline='') as csvfile:
+        chunk = []
+        for idx, row in enumerate(csv.reader(csvfile)):
+            if not row:
+                continue
+            chunk.append((idx, row))
+            if len(chunk) >= chunk_rows:
+                yield from _parse_chunk(chunk, on_diagnostic)
+                chunk = []
+        if chunk:
+            yield from _parse_chunk(chunk, on_diagnostic)
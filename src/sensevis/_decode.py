@@ -0,0 +1,125 @@
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib parser is used instead
+    orjson = None
+
+# JSON backend used for full parses: 'orjson' when installed, otherwise 'json'
+BACKEND = 'orjson' if orjson is not None else 'json'
+loads = orjson.loads if orjson is not None else json.loads
+
+# Values per bbox in the compact format (a flat number list instead of a list of lists)
+DEFAULT_BBOX_LEN = 5
+
+
+def has_bboxes(message) -> bool:
+    """Cheap substring pre-check; False means the message can't carry bboxes and needn't be parsed."""
+    if isinstance(message, memoryview):
+        message = bytes(message)
+    return (b'bboxes' if isinstance(message, (bytes, bytearray)) else 'bboxes') in message
+
+
+def centroids_from_bboxes(bboxes, bbox_len: int = DEFAULT_BBOX_LEN) -> np.ndarray:
+    """
+    (N, 2) float array of the (x, y) centroids in `bboxes`, i.e. the 3rd and 2nd last value of
+    each bbox. Accepts a list of bboxes, or the compact form: one flat list holding `bbox_len`
+    values per bbox. Only x and y have to be numbers (other fields, e.g. a class label, are
+    ignored). Bboxes with fewer than 3 values are skipped. Raises ValueError if `bboxes`
+    isn't a list.
+    """
+    if not isinstance(bboxes, (list, tuple)):
+        raise ValueError(f'bboxes must be a list, got {type(bboxes).__name__}')
+    if not bboxes:
+        return np.empty((0, 2), dtype=np.float64)
+    if not isinstance(bboxes[0], (list, tuple)):
+        if bbox_len < 3 or len(bboxes) % bbox_len:
+            raise ValueError(f'compact bboxes: {len(bboxes)} values is not a multiple of bbox_len={bbox_len}')
+        xs = np.asarray(bboxes[bbox_len - 3::bbox_len], dtype=np.float64)
+        ys = np.asarray(bboxes[bbox_len - 2::bbox_len], dtype=np.float64)
+        return np.column_stack([xs, ys])
+    if all(len(bbox) >= 3 for bbox in bboxes):
+        # Every row usable: one conversion of the (x, y) slices for the whole message
+        return np.asarray([bbox[-3:-1] for bbox in bboxes], dtype=np.float64).reshape(-1, 2)
+    out = np.empty((len(bboxes), 2), dtype=np.float64)
+    n = 0
+    for bbox in bboxes:
+        if len(bbox) >= 3:
+            out[n] = bbox[-3], bbox[-2]
+            n += 1
+    return out[:n]
+
+
+def _envelopes(message):
+    try:
+        doc = loads(message)
+    except ValueError:
+        # Newline-delimited batch: one envelope per line
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            message = bytes(message).decode()
+        lines = [line for line in message.splitlines() if line.strip()]
+        if len(lines) < 2:
+            raise
+        return [loads(line) for line in lines]
+    return doc if isinstance(doc, list) else [doc]
+
+
+def _payloads(message) -> List[dict]:
+    # Every payload in a message that carries bboxes, oldest first
+    if isinstance(message, memoryview):
+        message = bytes(message)  # json.loads doesn't take memoryviews
+    if not has_bboxes(message):
+        return []
+    payloads = []
+    for envelope in _envelopes(message):
+        payload = envelope.get('payload', {})
+        if payload.get('bboxes') is not None:
+            payloads.append(payload)
+    return payloads
+
+
+def decode_payloads(message) -> List[Tuple[np.ndarray, Optional[float]]]:
+    """
+    (centroids, sent_at) for every frame in a WebSocket message that carries bboxes, oldest
+    first; [] when there are none. `sent_at` is the payload's sender timestamp (unix time), or
+    None when it has no numeric one. Besides a single {"payload": {"bboxes": ...}} envelope, a
+    message may batch several envelopes as a JSON array or as newline-delimited JSON.
+    Raises ValueError/AttributeError/TypeError on malformed messages.
+    """
+    frames = []
+    for payload in _payloads(message):
+        sent_at = payload.get('sent_at')
+        if isinstance(sent_at, bool) or not isinstance(sent_at, (int, float)):
+            sent_at = None
+        centroids = centroids_from_bboxes(payload['bboxes'], payload.get('bbox_len', DEFAULT_BBOX_LEN))
+        frames.append((centroids, sent_at))
+    return frames
+
+
+def decode_frames(message) -> List[np.ndarray]:
+    """Centroid arrays for every frame in a message (see decode_payloads), oldest first."""
+    return [centroids for centroids, _ in decode_payloads(message)]
+
+
+def decode_centroids(message) -> Optional[np.ndarray]:
+    """Centroids of the most recent frame in a message, or None if it carries no bboxes."""
+    frames = decode_frames(message)
+    return frames[-1] if frames else None
+
+
+def decode_centroid_values(message) -> Optional[list]:
+    """
+    Like decode_centroids, but as [[x, y], ...] holding the values exactly as sent (ints stay
+    ints), for output that must match the message, e.g. the legacy data.json.
+    """
+    payloads = _payloads(message)
+    if not payloads:
+        return None
+    bboxes, bbox_len = payloads[-1]['bboxes'], payloads[-1].get('bbox_len', DEFAULT_BBOX_LEN)
+    centroids_from_bboxes(bboxes, bbox_len)  # same checks, and errors, as the array path
+    if bboxes and not isinstance(bboxes[0], (list, tuple)):
+        return [list(bboxes[i + bbox_len - 3:i + bbox_len - 1]) for i in range(0, len(bboxes), bbox_len)]
+    return [list(bbox[-3:-1]) for bbox in bboxes if len(bbox) >= 3]
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Dict, Set
+
+import numpy as np
+from websockets.asyncio.server import broadcast, serve
+
+from ._metrics import get_logger
+from ._post import BASE_CLIENT_ID
+from ._upscaler import LIVE_COORD_RANGE
+
+logger = get_logger('fakeserver')
+
+SUBSCRIBE_PATH = '/api/subscribe/occupancy'
+REGISTER_PATH = '/ws/register'
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+@dataclass
+class FakeServerStats:
+    subscriptions: int = 0
+    registrations: int = 0
+    messages_sent: int = 0  # one per socket a message went to
+    disconnects: int = 0  # sockets dropped on purpose by `disconnect_every`
+    late_ticks: int = 0  # ticks that started behind schedule; the sender can't keep up with `rate`
+
+
+class FakeSenseAI:
+    """
+    Local stand-in for the SenseAI backend, for offline throughput and reconnect testing.
+
+    Serves `POST /api/subscribe/occupancy?topic=senseai/<name>/tx` over HTTP and
+    `/ws/register?clientId=python-client-<name>` over WebSocket, on separate ports (see
+    `api_url` / `ws_url`, or export them as SENSEVIS_API_URL / SENSEVIS_WS_URL). Once a
+    sensor is subscribed, each of its registered sockets gets `rate` messages per second of
+    `{"payload": {"bboxes": [[left, top, x, y, score], ...], "seq": n, "sent_at": unix_time}}`,
+    with `people` synthetic people random-walking over the live coordinate range. Any sensor
+    name is accepted. With `disconnect_every`, a sensor's sockets are aborted after that many
+    messages, as a dropped connection would be.
+    """
+
+    def __init__(self, rate: float = 5.0, people: int = 3, host: str = '127.0.0.1', http_port: int = 0,
+                 ws_port: int = 0, step: float = 0.5, disconnect_every: int | None = None,
+                 seed: int | None = None):
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.rate = rate
+        self.people = people
+        self.host = host
+        self.http_port = http_port
+        self.ws_port = ws_port
+        self.step = step
+        self.disconnect_every = disconnect_every
+        self.stats = FakeServerStats()
+        self.subscribed: Set[str] = set()
+        self._sockets: Dict[str, set] = {}
+        self._positions: Dict[str, np.ndarray] = {}
+        self._seq: Dict[str, int] = {}
+        self._rng = np.random.default_rng(seed)
+        self._http = None
+        self._ws = None
+        self._emitter = None
+
+    @property
+    def api_url(self) -> str:
+        return f'http://{self.host}:{self.http_port}'
+
+    @property
+    def ws_url(self) -> str:
+        return f'ws://{self.host}:{self.ws_port}'
+
+    async def start(self):
+        self._http = await asyncio.start_server(self._handle_http, self.host, self.http_port)
+        self.http_port = self._http.sockets[0].getsockname()[1]
+        self._ws = await serve(self._register, self.host, self.ws_port, process_request=self._check_path)
+        self.ws_port = self._ws.sockets[0].getsockname()[1]
+        self._emitter = asyncio.create_task(self._emit())
+
+    async def stop(self):
+        if self._emitter is not None:
+            self._emitter.cancel()
+            await asyncio.gather(self._emitter, return_exceptions=True)
+        if self._ws is not None:
+            self._ws.close()
+            await self._ws.wait_closed()
+        if self._http is not None:
+            self._http.close()
+            await self._http.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def message(self, sensor_name) -> str:
+        """Next synthetic message for a sensor; advances its people one step."""
+        (x_min, x_max), (y_min, y_max) = LIVE_COORD_RANGE
+        positions = self._positions.get(sensor_name)
+        if positions is None:
+            positions = self._rng.uniform((x_min, y_min), (x_max, y_max), size=(self.people, 2))
+        else:
+            positions = positions + self._rng.normal(0, self.step, size=positions.shape)
+            positions = np.clip(positions, (x_min, y_min), (x_max, y_max))
+        self._positions[sensor_name] = positions
+        seq = self._seq[sensor_name] = self._seq.get(sensor_name, 0) + 1
+        bboxes = np.column_stack([positions - 1, positions, np.full(len(positions), 0.9)]).round(2)
+        return json.dumps({'payload': {'bboxes': bboxes.tolist(), 'seq': seq, 'sent_at': time.time()}})
+
+    async def _emit(self):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.rate
+        next_tick = loop.time()
+        while True:
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Behind schedule: send the next tick now rather than bursting to catch up
+                self.stats.late_ticks += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+            for name in list(self.subscribed):
+                sockets = self._sockets.get(name)
+                if not sockets:
+                    continue
+                broadcast(sockets, self.message(name))
+                self.stats.messages_sent += len(sockets)
+                if self.disconnect_every and self._seq[name] % self.disconnect_every == 0:
+                    for websocket in list(sockets):
+                        websocket.transport.abort()
+                        self.stats.disconnects += 1
+
+    def _check_path(self, connection, request):
+        if urllib.parse.urlsplit(request.path).path != REGISTER_PATH:
+            return connection.respond(404, 'Not Found\n')
+        return None
+
+    async def _register(self, websocket):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(websocket.request.path).query)
+        client_id = query.get('clientId', [''])[0]
+        sensor_name = client_id.removeprefix(f'{BASE_CLIENT_ID}-')
+        if not sensor_name:
+            await websocket.close(1008, 'clientId is required')
+            return
+        self.stats.registrations += 1
+        sockets = self._sockets.setdefault(sensor_name, set())
+        sockets.add(websocket)
+        try:
+            await websocket.wait_closed()
+        finally:
+            sockets.discard(websocket)
+
+    async def _handle_http(self, reader, writer):
+        # Keep-alive loop: subscribe_many reuses pooled connections
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                method, target, _ = request_line.split(' ', 2)
+                length = 0
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                status, body = self._subscribe(method, target)
+                writer.write((f'HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n'
+                              f'Content-Length: {len(body)}\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, UnicodeDecodeError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _subscribe(self, method, target):
+        url = urllib.parse.urlsplit(target)
+        if url.path != SUBSCRIBE_PATH:
+            return 404, b'{"error": "not found"}'
+        if method != 'POST':
+            return 405, b'{"error": "method not allowed"}'
+        topic = urllib.parse.parse_qs(url.query).get('topic', [''])[0]
+        parts = topic.split('/')
+        if len(parts) != 3 or parts[0] != 'senseai' or parts[2] != 'tx' or not parts[1]:
+            return 400, json.dumps({'error': f'bad topic {topic!r}'}).encode()
+        self.subscribed.add(parts[1])
+        self.stats.subscriptions += 1
+        return 200, json.dumps({'status': 'subscribed', 'topic': topic}).encode()
+
+
+async def run(rate=5.0, people=3, host='127.0.0.1', http_port=8001, ws_port=8002, disconnect_every=None):
+    async with FakeSenseAI(rate, people, host, http_port, ws_port, disconnect_every=disconnect_every) as fake:
+        logger.info('Fake SenseAI running; point clients at it with:')
+        logger.info('  export SENSEVIS_API_URL=%s SENSEVIS_WS_URL=%s', fake.api_url, fake.ws_url)
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake SenseAI server streaming synthetic bboxes')
+    parser.add_argument('--rate', type=float, default=5.0, help='messages per second per sensor')
+    parser.add_argument('--people', type=int, default=3, help='synthetic people per sensor')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--http-port', type=int, default=8001)
+    parser.add_argument('--ws-port', type=int, default=8002)
+    parser.add_argument('--disconnect-every', type=int, default=None,
+                        help='drop a sensor\'s sockets after this many messages, to exercise reconnects')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(run(args.rate, args.people, args.host, args.http_port, args.ws_port, args.disconnect_every))
@@ -0,0 +1,275 @@
+import mmap
+import os
+import struct
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from ._csvframes import iter_frames
+
+# File layout: a file header (magic, version, coordinate space, index interval, and for logs
+# converted from a CSV the clock it was stamped with: row idx at origin + idx / fps) followed by
+# append-only records: (unix timestamp float64, centroid count uint32) and `count` little-endian
+# float32 (x, y) pairs. Every `index_every`-th record's (timestamp, offset) also goes to a
+# sidecar <file>.idx, so finding the frame at time T is a binary search plus a short scan.
+MAGIC = b'SVH1'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHIdd')
+RECORD = struct.Struct('<dI')
+INDEX_ENTRY = np.dtype([('timestamp', '<f8'), ('offset', '<u8')])
+SUFFIX = '.svh'
+INDEX_SUFFIX = '.idx'
+
+# Coordinate space of the stored centroids
+SPACE_LIVE = 0  # live sensor centroids, x in [1,32], y in [1,24]
+SPACE_CSV = 1  # centroid.csv positions, 1..100
+
+
+class HistoryFrame(NamedTuple):
+    seq: int  # position in the log, from 0
+    timestamp: float
+    centroids: np.ndarray  # (N, 2) float64
+
+
+def index_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def _read_header(buf, path):
+    if len(buf) < FILE_HEADER.size:
+        raise ValueError(f'{path} is not a history file')
+    magic, version, space, index_every, origin, fps = FILE_HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a history file')
+    return space, index_every, origin, fps
+
+
+def _scan(buf, offset: int, seq: int) -> Iterator[tuple]:
+    """Yield (seq, offset, timestamp, count) for every complete record from `offset` on."""
+    size = len(buf)
+    while offset + RECORD.size <= size:
+        timestamp, count = RECORD.unpack_from(buf, offset)
+        end = offset + RECORD.size + count * 8
+        if end > size:
+            break  # torn tail from an interrupted append
+        yield seq, offset, timestamp, count
+        offset = end
+        seq += 1
+
+
+def _load_index(path) -> np.ndarray:
+    try:
+        raw = index_path(path).read_bytes()
+    except FileNotFoundError:
+        return np.empty(0, dtype=INDEX_ENTRY)
+    return np.frombuffer(raw, dtype=INDEX_ENTRY, count=len(raw) // INDEX_ENTRY.itemsize)
+
+
+class HistoryWriter:
+    """
+    Appends centroid frames to a history file. Timestamps must not go backwards; frames stamped
+    with the wall clock (no explicit timestamp) are clamped to the last timestamp instead, so a
+    clock stepping back doesn't fail ingest. Reopening an existing file continues it; a record
+    torn by a crash is cut off and the index repaired. Records are written with one write()
+    each and pushed to the OS on flush() / close(). `origin` and `fps` record the clock of a log
+    converted from a CSV (see csv_to_history); leave them at 0 otherwise.
+    """
+
+    def __init__(self, path, space: int = SPACE_LIVE, index_every: int = 256, origin: float = 0.0,
+                 fps: float = 0.0):
+        self.path = Path(path)
+        self.index_path = index_path(self.path)
+        self.seq = 0  # records in the file
+        self.last_timestamp = float('-inf')
+        if self.path.exists() and self.path.stat().st_size:
+            self._recover()
+        else:
+            self.space, self.index_every, self.origin, self.fps = space, index_every, origin, fps
+            self.path.write_bytes(FILE_HEADER.pack(MAGIC, VERSION, space, index_every, origin, fps))
+            self.index_path.write_bytes(b'')
+        self._offset = self.path.stat().st_size
+        self._file = open(self.path, 'ab')
+        self._index = open(self.index_path, 'ab')
+
+    def _recover(self):
+        raw = self.path.read_bytes()
+        self.space, self.index_every, self.origin, self.fps = _read_header(raw, self.path)
+        index = _load_index(self.path)
+        index = index[index['offset'] < len(raw)]
+        # Rescan from the last indexed record; if that one was torn, back up an index entry
+        while True:
+            if len(index):
+                seq, offset = (len(index) - 1) * self.index_every, int(index['offset'][-1])
+            else:
+                seq, offset = 0, FILE_HEADER.size
+            records = list(_scan(raw, offset, seq))
+            if records or not len(index):
+                break
+            index = index[:-1]
+        entries = [index[:-1].tobytes() if len(index) else b'']
+        end = offset
+        for seq, offset, timestamp, count in records:
+            if seq % self.index_every == 0:
+                entries.append(np.array([(timestamp, offset)], dtype=INDEX_ENTRY).tobytes())
+            self.seq, self.last_timestamp = seq + 1, timestamp
+            end = offset + RECORD.size + count * 8
+        if end < len(raw):
+            os.truncate(self.path, end)
+        self.index_path.write_bytes(b''.join(entries))
+
+    def append(self, centroids, timestamp: Optional[float] = None) -> int:
+        """Append one frame; returns its sequence number."""
+        if timestamp is None:
+            timestamp = max(time.time(), self.last_timestamp)
+        timestamp = float(timestamp)
+        if timestamp < self.last_timestamp:
+            raise ValueError(f'timestamp {timestamp} is before the last one ({self.last_timestamp})')
+        points = np.asarray(centroids, dtype='<f4').reshape(-1, 2)
+        self._file.write(RECORD.pack(timestamp, len(points)) + points.tobytes())
+        if self.seq % self.index_every == 0:
+            self._index.write(np.array([(timestamp, self._offset)], dtype=INDEX_ENTRY).tobytes())
+        self._offset += RECORD.size + points.nbytes
+        self.last_timestamp = timestamp
+        self.seq += 1
+        return self.seq - 1
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoryReader:
+    """
+    Memory-mapped, read-only view of a history file. `frames()` streams a time range and
+    `frame_at(t)` returns the last frame recorded at or before t. The mapping covers the file
+    as it was when opened; call refresh() to see frames appended since.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._map = None
+        self.refresh()
+
+    def refresh(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.space, self.index_every, self.origin, self.fps = _read_header(self._map, self.path)
+        self.index = _load_index(self.path)
+        self.index = self.index[self.index['offset'] < len(self._map)]
+
+    def _seek(self, timestamp: float, side: str):
+        """(seq, offset) of the indexed record to start scanning from for `timestamp`."""
+        i = int(np.searchsorted(self.index['timestamp'], timestamp, side=side)) - 1
+        if i < 0:
+            return 0, FILE_HEADER.size
+        return i * self.index_every, int(self.index['offset'][i])
+
+    def _frame(self, seq, offset, timestamp, count) -> HistoryFrame:
+        points = np.frombuffer(self._map, dtype='<f4', count=count * 2, offset=offset + RECORD.size)
+        return HistoryFrame(seq, timestamp, points.astype(np.float64).reshape(-1, 2))
+
+    def frames(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[HistoryFrame]:
+        """Frames with start <= timestamp <= end (either bound optional), in order."""
+        seq, offset = (0, FILE_HEADER.size) if start is None else self._seek(start, 'left')
+        for seq, offset, timestamp, count in _scan(self._map, offset, seq):
+            if end is not None and timestamp > end:
+                return
+            if start is None or timestamp >= start:
+                yield self._frame(seq, offset, timestamp, count)
+
+    def frame_at(self, timestamp: float) -> Optional[HistoryFrame]:
+        found = None
+        seq, offset = self._seek(timestamp, 'right')
+        for record in _scan(self._map, offset, seq):
+            if record[2] > timestamp:
+                break
+            found = record
+        return self._frame(*found) if found is not None else None
+
+    def row_index(self, frame: HistoryFrame) -> int:
+        """Source CSV row of a frame in a csv_to_history log (rows the CSV reader skipped leave
+        gaps), or its position in the log for any other file."""
+        if self.fps:
+            return round((frame.timestamp - self.origin) * self.fps)
+        return frame.seq
+
+    def __iter__(self):
+        return self.frames()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoryStore:
+    """One history file per sensor under `root`, with a writer kept open per sensor."""
+
+    def __init__(self, root, index_every: int = 256):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_every = index_every
+        self._writers: Dict[str, HistoryWriter] = {}
+
+    def path(self, sensor_name) -> Path:
+        return self.root / f"{urllib.parse.quote(sensor_name, safe='')}{SUFFIX}"
+
+    def append(self, sensor_name, centroids, timestamp: Optional[float] = None) -> int:
+        writer = self._writers.get(sensor_name)
+        if writer is None:
+            writer = self._writers[sensor_name] = HistoryWriter(self.path(sensor_name), index_every=self.index_every)
+        return writer.append(centroids, timestamp)
+
+    def reader(self, sensor_name) -> HistoryReader:
+        writer = self._writers.get(sensor_name)
+        if writer is not None:
+            writer.flush()
+        return HistoryReader(self.path(sensor_name))
+
+    def flush(self):
+        for writer in self._writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def sensors(self) -> List[str]:
+        return sorted(urllib.parse.unquote(p.name[:-len(SUFFIX)]) for p in self.root.glob(f'*{SUFFIX}'))
+
+
+def csv_to_history(csv_path, out_path, fps: float = 5.0, start: float = 0.0, index_every: int = 256,
+                   on_diagnostic=None) -> int:
+    """
+    Convert a centroid CSV to a history file (SPACE_CSV), row idx stamped at start + idx / fps.
+    Rows the CSV reader skips are reported to `on_diagnostic` and left out. Returns the frame count.
+    """
+    out_path = Path(out_path)
+    for stale in (out_path, index_path(out_path)):
+        stale.unlink(missing_ok=True)
+    with HistoryWriter(out_path, space=SPACE_CSV, index_every=index_every, origin=start, fps=fps) as writer:
+        for idx, xs, ys in iter_frames(csv_path, on_diagnostic=on_diagnostic):
+            writer.append(np.column_stack([xs, ys]), start + idx / fps)
+        return writer.seq
@@ -0,0 +1,227 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond renders up to slow reconnects
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry, self.name, self.help, self.labelnames = registry, name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry._notify(self.name, labels, amount)
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def _render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_label_str(self.labelnames, key)} {value:g}' for key, value in items]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry, self.name, self.help, self.labelnames = registry, name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+        self.registry._notify(self.name, labels, value)
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def _render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_label_str(self.labelnames, key)} {value:g}' for key, value in items]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry, self.name, self.help, self.labelnames = registry, name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        self.registry._notify(self.name, labels, value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        return series[-1] if series else 0
+
+    def _render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_label_str(self.labelnames, key, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_label_str(self.labelnames, key, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_label_str(self.labelnames, key)} {series[-2]:g}')
+            lines.append(f'{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    """
+    Process-wide metrics. Metrics are created on first use (`counter()` / `gauge()` / `histogram()`
+    return the existing one for a name), rendered in Prometheus text format by `render()`,
+    and every observation is also passed to hooks added with `add_hook(fn)`, called as
+    fn(metric_name, labels, value).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._hooks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def add_hook(self, hook: Callable):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable):
+        self._hooks.remove(hook)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric._render())
+        return '\n'.join(lines) + '\n'
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} is already registered as a {metric.kind}')
+            return metric
+
+    def _notify(self, name, labels, value):
+        for hook in self._hooks:
+            hook(name, labels, value)
+
+
+METRICS = Registry()
+
+# Shared metrics, so every module reports under the same names
+MESSAGES = METRICS.counter('sensevis_messages_total', 'WebSocket messages received', ['sensor'])
+INGEST_LATENCY = METRICS.histogram(
+    'sensevis_ingest_latency_seconds', 'Time from a WebSocket message arriving to its update being queued', ['sensor'])
+FIRST_BBOX = METRICS.histogram(
+    'sensevis_subscribe_to_first_bbox_seconds', 'Time from the subscribe POST to the first bbox message', ['sensor'])
+RECONNECTS = METRICS.counter('sensevis_reconnects_total', 'WebSocket reconnect attempts', ['sensor'])
+ERRORS = METRICS.counter('sensevis_errors_total', 'Errors by component', ['component'])
+FRAMES = METRICS.counter('sensevis_frames_total', 'Frames by outcome (rendered, skipped, or suppressed by smoothing)', ['result'])
+# The only `stage` labels RENDER_STAGE is observed with, in pipeline order, on every render path
+RENDER_STAGES = ('base_load', 'centroid_mapping', 'halo_rings', 'upscale', 'encode', 'file_write')
+RENDER_STAGE = METRICS.histogram('sensevis_render_stage_seconds', 'Render time per pipeline stage', ['stage'])
+RENDER_QUEUE = METRICS.gauge('sensevis_render_queue_depth', 'Sensors with an update waiting for a render worker')
+RENDER_IN_FLIGHT = METRICS.gauge('sensevis_render_in_flight', 'Renders running on the worker pool')
+RENDER_DROPPED = METRICS.counter(
+    'sensevis_render_dropped_total', 'Updates replaced by a newer one before they were rendered', ['sensor'])
+RENDER_LATENCY = METRICS.histogram(
+    'sensevis_render_latency_seconds', 'Time from an update being scheduled to its render finishing')
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records with the same logger, message template and first argument
+    through per `interval` seconds; the rest are dropped and counted, and the next record that
+    gets through notes how many were suppressed. Messages lead with the sensor name (as in
+    '%s: connection lost ...'), so one noisy sensor doesn't silence the same warning for others,
+    while the later arguments (errors, delays) don't defeat the limit.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: Dict[Tuple[str, str, str], list] = {}  # key -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        args = record.args
+        first = args[0] if isinstance(args, tuple) and args else args
+        key = (record.name, str(record.msg), repr(first))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f'{record.msg} ({suppressed} similar messages suppressed)'
+        return True
+
+
+def get_logger(name: str, burst: int = 5, interval: float = 10.0) -> logging.Logger:
+    """`sensevis.<name>` logger with a RateLimitFilter, so chatty sensors can't flood the output."""
+    logger = logging.getLogger(f'sensevis.{name}')
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter(burst, interval))
+    return logger
@@ -1,33 +1,56 @@
 import asyncio
+import logging
+import os
+import time
 import websockets
 import json
+import numpy as np
+from dataclasses import dataclass, field
 
-from _upscaler import generate_image_from_centroids
-from _upscaler import generate_blank
+try:
+    from ._decode import decode_centroid_values, decode_payloads
+    from ._metrics import ERRORS, FIRST_BBOX, INGEST_LATENCY, MESSAGES, RECONNECTS, get_logger
+    from ._snapshot import atomic_write
+except ImportError:  # run as a script by SenseScraper.write_bbox
+    from _decode import decode_centroid_values, decode_payloads
+    from _metrics import ERRORS, FIRST_BBOX, INGEST_LATENCY, MESSAGES, RECONNECTS, get_logger
+    from _snapshot import atomic_write
 
-from sensevis import SenseScraper
+logger = get_logger('post')
 
 # CLIENT_ID = "3aeba6d2-6abe-4d90-bbfc-4bc779c32eb4"
 BASE_CLIENT_ID = "python-client"
+# Point at another deployment (or a local sensevis._fakeserver) with SENSEVIS_WS_URL
+WS_BASE_URL = os.environ.get("SENSEVIS_WS_URL", "wss://dev.sense-ai.org").rstrip("/")
 
-async def connect_and_receive(sensor_name):
+def register_uri(sensor_name, ws_url=WS_BASE_URL):
     # Create unique client ID for each sensor
     CLIENT_ID = f"{BASE_CLIENT_ID}-{sensor_name}"
-    uri = f"wss://dev.sense-ai.org/ws/register?clientId={CLIENT_ID}"
-    print(f"Connecting with Client ID: {CLIENT_ID}")
+    return f"{ws_url}/ws/register?clientId={CLIENT_ID}"
+
+def extract_centroids(message):
+    """Return the (x, y) centroids in a WebSocket message, or None if it carries no bboxes."""
+    # Values as sent, so data.json and read_bbox keep the sensor's ints
+    return decode_centroid_values(message)
+
+async def receive_centroids(websocket):
+    """Wait on an open, registered socket for the first message that carries bboxes."""
+    async for message in websocket:
+        centroids = extract_centroids(message)
+        if centroids is not None:
+            return centroids
+    raise ConnectionError('WebSocket closed before any bboxes were received')
+
+async def connect_and_receive(sensor_name, ws_url=WS_BASE_URL):
+    uri = register_uri(sensor_name, ws_url)
+    logger.info("Connecting with Client ID: %s-%s", BASE_CLIENT_ID, sensor_name)
     async with websockets.connect(uri) as websocket:
         try:
             while True:
                 # Receive a message from the server
                 response = await websocket.recv()
-                jsondoc = json.loads(response)
-                bboxes = jsondoc.get('payload', {}).get('bboxes')
-                if bboxes is not None:
-                    centroids = []
-                    for bbox in bboxes:
-                        if len(bbox) >= 3:
-                            centroid = bbox[-3:-1]  # 2nd last and 3rd last values
-                            centroids.append(centroid)
+                centroids = extract_centroids(response)
+                if centroids is not None:
                     if centroids:
                         write_json(centroids)
                         break
@@ -36,23 +59,134 @@ async def connect_and_receive(sensor_name):
                         break
                         
         except Exception as e:
-            print(f'Error, exiting: {e}')
+            ERRORS.inc(component='ingest')
+            logger.error('Error, exiting: %s', e)
 
-def clear_json():
-    import os
+
+@dataclass
+class CentroidUpdate:
+    sensor_name: str
+    centroids: np.ndarray  # (N, 2) float array of (x, y); N == 0 when the room is empty
+    received_at: float = field(default_factory=time.monotonic)
+    track_ids: np.ndarray | None = None  # per-centroid person ids, once smoothed by _tracking
+    sent_at: float | None = None  # sender's unix time (payload.sent_at), when the message carries one
+
+
+class IngestService:
+    """
+    Long-running WebSocket ingest: keeps one registered connection open per sensor,
+    consumes the stream continuously and puts a CentroidUpdate on `queue` for every
+    frame of bboxes received (a batched message yields one update per frame; messages
+    without bboxes are dropped before parsing). Dropped connections are retried with exponential backoff.
+    """
+
+    def __init__(self, sensor_names, ws_url=WS_BASE_URL, queue_size=0,
+                 backoff_initial=0.5, backoff_max=30.0, store=None, history=None):
+        self.sensor_names = list(sensor_names)
+        # Optional SnapshotStore; every update is also published there for file-based consumers
+        self.store = store
+        # Optional HistoryStore; every update is also appended to the sensor's history log
+        self.history = history
+        self.ws_url = ws_url
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.connected = {name: asyncio.Event() for name in self.sensor_names}
+        self.reconnects = {name: 0 for name in self.sensor_names}
+        self._subscribed_at = {}
+        self._tasks = []
+
+    async def start(self):
+        """Open a connection for every sensor in the background."""
+        self._tasks = [asyncio.create_task(self._sensor_loop(name)) for name in self.sensor_names]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def mark_subscribed(self, sensor_name):
+        """Record when the subscribe POST went out, to time the first bbox that follows."""
+        self._subscribed_at[sensor_name] = time.monotonic()
+
+    async def updates(self):
+        """Yield centroid updates from every sensor as they arrive."""
+        while True:
+            yield await self.queue.get()
+
+    async def _sensor_loop(self, sensor_name):
+        uri = register_uri(sensor_name, self.ws_url)
+        delay = self.backoff_initial
+        while True:
+            try:
+                async with websockets.connect(uri) as websocket:
+                    self.connected[sensor_name].set()
+                    delay = self.backoff_initial
+                    async for message in websocket:
+                        received_at = time.monotonic()
+                        MESSAGES.inc(sensor=sensor_name)
+                        try:
+                            frames = decode_payloads(message)
+                        except (ValueError, AttributeError, TypeError) as e:
+                            ERRORS.inc(component='decode')
+                            logger.warning('%s: skipping malformed message: %s', sensor_name, e)
+                            continue
+                        if not frames:
+                            continue
+                        subscribed_at = self._subscribed_at.pop(sensor_name, None)
+                        if subscribed_at is not None:
+                            FIRST_BBOX.observe(received_at - subscribed_at, sensor=sensor_name)
+                        for centroids, sent_at in frames:
+                            if self.store is not None:
+                                try:
+                                    self.store.publish(sensor_name, centroids)
+                                except OSError as e:
+                                    # e.g. a full disk; the socket is fine, so keep consuming
+                                    ERRORS.inc(component='snapshot')
+                                    logger.error('%s: could not publish snapshot: %s', sensor_name, e)
+                            if self.history is not None:
+                                try:
+                                    self.history.append(sensor_name, centroids)
+                                except (OSError, ValueError) as e:
+                                    # A failing history log must not take the live feed down with it
+                                    ERRORS.inc(component='history')
+                                    logger.error('%s: could not append to history: %s', sensor_name, e)
+                            await self.queue.put(CentroidUpdate(sensor_name, centroids, received_at, sent_at=sent_at))
+                        INGEST_LATENCY.observe(time.monotonic() - received_at, sensor=sensor_name)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                ERRORS.inc(component='websocket')
+                logger.warning('%s: connection lost (%s), retrying in %.1fs', sensor_name, e, delay)
+            finally:
+                self.connected[sensor_name].clear()
+            self.reconnects[sensor_name] += 1
+            RECONNECTS.inc(sensor=sensor_name)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.backoff_max)
+
+
+def _replace_json(text):
+    # Replace data.json atomically, so readers never see it truncated or half-written
     root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    data_json_path = os.path.join(root_dir, 'data.json')
-    with open(data_json_path, 'w') as file:
-        file.truncate(0)
+    atomic_write(os.path.join(root_dir, 'data.json'), text.encode('utf-8'))
+
+def clear_json():
+    _replace_json('')
 
 def write_json(bbox):
-    import os
-    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    data_json_path = os.path.join(root_dir, 'data.json')
-    with open(data_json_path, 'w', encoding='utf-8') as file:
-        json.dump(bbox, file)
+    _replace_json(json.dumps(bbox))
 
 # Run the client
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     userInput = input("Enter the sensor name: ")
     asyncio.run(connect_and_receive(userInput))
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Set
+
+from ._metrics import ERRORS, RENDER_DROPPED, RENDER_IN_FLIGHT, RENDER_LATENCY, RENDER_QUEUE, get_logger
+from ._post import CentroidUpdate
+
+logger = get_logger('scheduler')
+
+
+@dataclass
+class SchedulerStats:
+    submitted: int = 0
+    rendered: int = 0
+    dropped: int = 0  # replaced by a newer update for the same sensor before a worker picked it up
+    failed: int = 0
+    queue_depth: int = 0  # sensors with an update waiting
+    in_flight: int = 0
+    max_queue_depth: int = 0
+
+
+class RenderScheduler:
+    """
+    Runs renders on a worker pool so the event loop only ever does ingest.
+
+    `submit()` never blocks: it parks the update in a per-sensor slot, replacing (and counting
+    as dropped) any update for that sensor still waiting, so a slow sensor costs at most one
+    pending frame and what finally renders is always the newest one. At most `max_in_flight`
+    renders run at once and at most one per sensor, so a sensor's frames finish in order and a
+    per-sensor renderer is never used from two workers. Waiting sensors are served oldest first.
+
+    `render(sensor_name, centroids)` runs in `executor` (a thread pool of `max_in_flight`
+    workers by default; the numpy and zlib work in a render releases the GIL). Its result is
+    passed to `on_result(sensor_name, result)` back on the event loop. For example, to keep the
+    legacy entry point off the loop:
+
+        RenderScheduler(lambda name, c: generate_image_from_centroids(c, name, save_grid=False))
+    """
+
+    def __init__(self, render: Callable, on_result: Callable | None = None, max_in_flight: int | None = None,
+                 executor: Executor | None = None):
+        self.render = render
+        self.on_result = on_result
+        self.max_in_flight = max_in_flight or min(32, os.cpu_count() or 1)
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(self.max_in_flight, thread_name_prefix='sensevis-render')
+        self.stats = SchedulerStats()
+        self._pending: OrderedDict[str, tuple] = OrderedDict()  # sensor -> (centroids, submitted_at)
+        self._running: Set[str] = set()
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    def submit(self, sensor_name, centroids) -> bool:
+        """Queue a render; returns False if it replaced an update still waiting for that sensor."""
+        if self._closed:
+            raise RuntimeError('scheduler is closed')
+        self.stats.submitted += 1
+        replaced = sensor_name in self._pending
+        if replaced:
+            # Keep the sensor's place in line, take the newer frame
+            self._pending[sensor_name] = (centroids, self._pending[sensor_name][1])
+            self.stats.dropped += 1
+            RENDER_DROPPED.inc(sensor=sensor_name)
+        else:
+            self._pending[sensor_name] = (centroids, time.perf_counter())
+        self._idle.clear()
+        self._dispatch()
+        return not replaced
+
+    async def run(self, updates: AsyncIterator[CentroidUpdate]):
+        """Submit every update from an async iterator (e.g. IngestService.updates())."""
+        async for update in updates:
+            self.submit(update.sensor_name, update.centroids)
+
+    async def drain(self):
+        """Wait until nothing is waiting or rendering."""
+        await self._idle.wait()
+
+    async def close(self, drain: bool = True):
+        """Stop accepting updates; with `drain`, finish what is queued first, else discard it."""
+        self._closed = True
+        if not drain:
+            self._pending.clear()
+        if self._running or self._pending:
+            await self.drain()
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+        self._update_gauges()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close(drain=exc[0] is None)
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while len(self._running) < self.max_in_flight:
+            sensor_name = next((name for name in self._pending if name not in self._running), None)
+            if sensor_name is None:
+                break
+            centroids, submitted_at = self._pending.pop(sensor_name)
+            self._running.add(sensor_name)
+            future = loop.run_in_executor(self.executor, self.render, sensor_name, centroids)
+            future.add_done_callback(lambda f, name=sensor_name, t=submitted_at: self._done(name, t, f))
+        self._update_gauges()
+
+    def _done(self, sensor_name, submitted_at, future):
+        self._running.discard(sensor_name)
+        if future.cancelled():
+            pass
+        elif future.exception() is not None:
+            self.stats.failed += 1
+            ERRORS.inc(component='render')
+            logger.error('Render for %s failed: %r', sensor_name, future.exception())
+        else:
+            self.stats.rendered += 1
+            RENDER_LATENCY.observe(time.perf_counter() - submitted_at)
+            if self.on_result is not None:
+                try:
+                    self.on_result(sensor_name, future.result())
+                except Exception as e:
+                    ERRORS.inc(component='render')
+                    logger.error('Handling the render for %s failed: %r', sensor_name, e)
+        self._dispatch()
+        if not self._pending and not self._running:
+            self._idle.set()
+
+    def _update_gauges(self):
+        self.stats.queue_depth = len(self._pending)
+        self.stats.in_flight = len(self._running)
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        RENDER_QUEUE.set(self.stats.queue_depth)
+        RENDER_IN_FLIGHT.set(self.stats.in_flight)
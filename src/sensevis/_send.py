@@ -1,43 +1,132 @@
+import asyncio
 import httpx
+import logging
+import os
+import time
 import urllib.parse
+from dataclasses import dataclass
 
-def send_request(sensor_name = "InnoWing-12"):
+try:
+    from ._metrics import ERRORS, get_logger
+except ImportError:  # run as a script by SenseScraper.write_bbox
+    from _metrics import ERRORS, get_logger
+
+logger = get_logger('send')
+
+# Point at another deployment (or a local sensevis._fakeserver) with SENSEVIS_API_URL
+API_BASE_URL = os.environ.get("SENSEVIS_API_URL", "https://dev.sense-ai.org").rstrip("/")
+
+def subscribe_url(sensor_name, api_url=API_BASE_URL):
     # Base URL and query parameters
-    base_url = "https://dev.sense-ai.org/api/subscribe/occupancy"
+    base_url = f"{api_url}/api/subscribe/occupancy"
     topic = f"senseai/{sensor_name}/tx"
     
     # URL encode the topic parameter
     encoded_topic = urllib.parse.quote(topic)
     
     # Construct the full URL with query parameters
-    url = f"{base_url}?topic={encoded_topic}"
-    
+    return f"{base_url}?topic={encoded_topic}"
+
+def subscribe_headers(sensor_name):
     # Create unique client ID for each sensor
     client_id = f"python-client-{sensor_name}"
-    print(f"Using Client ID: {client_id}")
-    
-    # Headers
-    headers = {
+    return {
         'X-Client-Id': client_id
     }
+
+def send_request(sensor_name = "InnoWing-12", api_url=API_BASE_URL):
+    url = subscribe_url(sensor_name, api_url)
+    headers = subscribe_headers(sensor_name)
+    logger.info("Using Client ID: %s", headers['X-Client-Id'])
     
     try:
         # Make the POST request
         with httpx.Client() as client:
             response = client.post(url, headers=headers)
             
-            # Print response details
-            print(f"Status Code: {response.status_code}")
-            print(f"Response Headers: {dict(response.headers)}")
-            print(f"Response Body: {response.text}")
+            # Log response details; headers and body only at debug level
+            logger.info("Status Code: %s", response.status_code)
+            logger.debug("Response Headers: %s", dict(response.headers))
+            logger.debug("Response Body: %s", response.text)
             
             return response
             
     except httpx.RequestError as e:
-        print(f"Error making request: {e}")
+        ERRORS.inc(component='subscribe')
+        logger.error("Error making request: %s", e)
+        return None
+
+async def send_request_async(sensor_name = "InnoWing-12", client=None, api_url=API_BASE_URL):
+    """Async version of send_request; reuses `client` (an httpx.AsyncClient) when given."""
+    url = subscribe_url(sensor_name, api_url)
+    headers = subscribe_headers(sensor_name)
+    try:
+        if client is not None:
+            return await client.post(url, headers=headers)
+        async with httpx.AsyncClient() as client:
+            return await client.post(url, headers=headers)
+    except httpx.RequestError as e:
+        ERRORS.inc(component='subscribe')
+        logger.error("Error making request: %s", e)
         return None
 
+@dataclass
+class SubscriptionResult:
+    sensor_name: str
+    ok: bool
+    status_code: int | None  # None if no response was ever received
+    attempts: int
+    elapsed: float  # seconds, including retries
+    error: str | None = None
+
+def _retryable(status_code):
+    return status_code == 429 or status_code >= 500
+
+async def subscribe_many(sensor_names, api_url=API_BASE_URL, concurrency=10, attempts=3,
+                         backoff=0.5, client=None, timeout=10.0):
+    """
+    Subscribe many sensors over one pooled, keep-alive httpx.AsyncClient.
+    At most `concurrency` requests are in flight (sensors waiting out a backoff don't count);
+    network errors, 429s and 5xx responses are retried up to `attempts` times in total with
+    exponential backoff. Returns one SubscriptionResult per sensor, in the order given.
+    """
+    if attempts < 1:
+        raise ValueError(f"attempts must be at least 1, got {attempts}")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def subscribe(client, sensor_name):
+        url = subscribe_url(sensor_name, api_url)
+        headers = subscribe_headers(sensor_name)
+        start = time.monotonic()
+        status_code, error = None, None
+        for attempt in range(1, attempts + 1):
+            try:
+                async with semaphore:
+                    response = await client.post(url, headers=headers)
+                status_code, error = response.status_code, None
+                if not response.is_error:
+                    return SubscriptionResult(sensor_name, True, status_code, attempt,
+                                              time.monotonic() - start)
+                error = f"HTTP {status_code}"
+                ERRORS.inc(component='subscribe')
+                if not _retryable(status_code):
+                    break
+            except httpx.RequestError as e:
+                status_code, error = None, f"{type(e).__name__}: {e}"
+                ERRORS.inc(component='subscribe')
+            if attempt < attempts:
+                # Back off outside the semaphore so a sleeping retry doesn't hold a slot
+                await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        return SubscriptionResult(sensor_name, False, status_code, attempt, time.monotonic() - start, error)
+
+    if client is not None:
+        return await asyncio.gather(*(subscribe(client, name) for name in sensor_names))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        return await asyncio.gather(*(subscribe(client, name) for name in sensor_names))
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     sensor_name = input("Enter sensor name: ")
     if (sensor_name == ""):
         send_request()
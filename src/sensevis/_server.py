@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import urllib.parse
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from ._metrics import METRICS, RENDER_STAGE, get_logger
+from ._post import WS_BASE_URL, IngestService
+from ._scheduler import RenderScheduler
+from ._send import API_BASE_URL, subscribe_many
+from ._tracking import smooth_updates
+from ._upscaler import BaseImage, IncrementalRenderer, encode_frame
+
+logger = get_logger('server')
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+@dataclass
+class Frame:
+    sensor_name: str
+    png: bytes
+    etag: str
+    seq: int
+    updated_at: float
+
+
+class _Listener:
+    """
+    One SSE client's pending frames: only the newest per sensor, so a stalled client costs at
+    most one frame per sensor however long it stalls, and catches up on the latest state.
+    """
+
+    def __init__(self, writer, sensor_name=None):
+        self.writer = writer
+        self.sensor_name = sensor_name
+        self.pending: OrderedDict[str, Frame] = OrderedDict()
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, frame: Frame):
+        if self.sensor_name is not None and frame.sensor_name != self.sensor_name:
+            return
+        # A newer frame replaces the sensor's waiting one but keeps its place in line
+        self.pending[frame.sensor_name] = frame
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+        if self.writer.transport.get_write_buffer_size():
+            # Stuck in drain() on a stalled client; don't let it hold up shutdown
+            self.writer.transport.abort()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check: `*` or any listed tag, compared weakly (W/ prefixes ignored)."""
+    if if_none_match.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+class FrameServer:
+    """
+    Small asyncio HTTP server for live occupancy frames.
+
+    Centroid updates (from an IngestService, or pushed with `publish`) are rendered with an
+    IncrementalRenderer per sensor and the latest PNG per sensor is kept in memory. Endpoints:
+
+        GET /sensor/<name>.png   latest frame, with ETag / If-None-Match -> 304
+        GET /events              Server-Sent Events, one `frame` event per new frame
+                                 (?sensor=<name> to follow a single sensor); a client that
+                                 falls behind skips to each sensor's newest frame
+        GET /sensors             JSON summary of every sensor's latest frame
+        GET /metrics             Prometheus text exposition of the process metrics
+
+    With `smoothing` (a dict of CentroidTracker options, {} for the defaults) ingest updates
+    are tracked and smoothed first, so jitter below one grid cell doesn't produce frames.
+    With `render_workers`, ingest updates are rendered on a RenderScheduler with that many
+    workers instead of on the event loop; a sensor whose renders fall behind skips to its
+    newest update rather than queueing them.
+    """
+
+    def __init__(self, ingest: IngestService | None = None, base: BaseImage | None = None,
+                 host: str = '127.0.0.1', port: int = 8080, compress_level: int = 1,
+                 smoothing: dict | None = None, render_workers: int | None = None):
+        self.ingest = ingest
+        self.smoothing = smoothing
+        self.scheduler = None
+        if render_workers:
+            self.scheduler = RenderScheduler(self._render, self._store, max_in_flight=render_workers)
+        self.base = base
+        self.renderers: dict[str, IncrementalRenderer] = {}
+        self.host = host
+        self.port = port
+        self.compress_level = compress_level
+        self.frames: dict[str, Frame] = {}
+        self._listeners: set[_Listener] = set()
+        self._server = None
+        self._consumer = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.ingest is not None:
+            await self.ingest.start()
+            self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        if self._consumer is not None:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+        if self.scheduler is not None:
+            await self.scheduler.close(drain=False)
+        if self.ingest is not None:
+            await self.ingest.stop()
+        for listener in list(self._listeners):
+            listener.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def publish(self, sensor_name, centroids) -> Frame | None:
+        """Render a centroid update; returns the new Frame, or None if the image didn't change."""
+        return self._store(sensor_name, self._render(sensor_name, centroids))
+
+    def _render(self, sensor_name, centroids) -> bytes | None:
+        # May run on a render worker. Nothing here is shared between sensors except the
+        # (locked) base image, and the scheduler never renders one sensor on two workers at once.
+        renderer = self.renderers.get(sensor_name)
+        if renderer is None:
+            renderer = self.renderers.setdefault(sensor_name, IncrementalRenderer(self.base, random.Random()))
+        _, upscaled, changed = renderer.render(sensor_name, centroids)
+        if not changed and sensor_name in self.frames:
+            return None
+        with RENDER_STAGE.time(stage='encode'):
+            return encode_frame(upscaled, 'png', upscaled=False, compress_level=self.compress_level)
+
+    def _store(self, sensor_name, png: bytes | None) -> Frame | None:
+        if png is None:
+            return None
+        etag = '"' + hashlib.blake2b(png, digest_size=12).hexdigest() + '"'
+        previous = self.frames.get(sensor_name)
+        frame = Frame(sensor_name, png, etag, previous.seq + 1 if previous else 1, time.time())
+        self.frames[sensor_name] = frame
+        for listener in self._listeners:
+            listener.push(frame)
+        return frame
+
+    async def _consume(self):
+        updates = self.ingest.updates()
+        if self.smoothing is not None:
+            updates = smooth_updates(updates, **self.smoothing)
+        if self.scheduler is not None:
+            await self.scheduler.run(updates)
+            return
+        async for update in updates:
+            self.publish(update.sensor_name, update.centroids)
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            for line in header_lines:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, UnicodeDecodeError):
+            writer.close()
+            return
+        try:
+            url = urllib.parse.urlsplit(target)
+            path = urllib.parse.unquote(url.path)
+            query = urllib.parse.parse_qs(url.query)
+            if method != 'GET':
+                await self._respond(writer, 405, b'')
+            elif path == '/events':
+                await self._stream_events(writer, query.get('sensor', [None])[0])
+            elif path == '/metrics':
+                await self._respond(writer, 200, METRICS.render().encode(),
+                                    {'Content-Type': 'text/plain; version=0.0.4'})
+            elif path == '/sensors':
+                body = json.dumps({name: {'etag': f.etag, 'seq': f.seq, 'updated_at': f.updated_at}
+                                   for name, f in self.frames.items()}).encode()
+                await self._respond(writer, 200, body, {'Content-Type': 'application/json'})
+            elif path.startswith('/sensor/') and path.endswith('.png'):
+                await self._serve_frame(writer, path[len('/sensor/'):-len('.png')], headers)
+            else:
+                await self._respond(writer, 404, b'')
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_frame(self, writer, sensor_name, headers):
+        frame = self.frames.get(sensor_name)
+        if frame is None:
+            await self._respond(writer, 404, b'')
+            return
+        cache_headers = {'ETag': frame.etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(headers.get('if-none-match', ''), frame.etag):
+            await self._respond(writer, 304, b'', cache_headers)
+            return
+        await self._respond(writer, 200, frame.png, {'Content-Type': 'image/png', **cache_headers})
+
+    async def _stream_events(self, writer, sensor_name):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n')
+        listener = _Listener(writer, sensor_name)
+        self._listeners.add(listener)
+        try:
+            # Start with the current frames so a new dashboard doesn't wait for the next change
+            for frame in list(self.frames.values()):
+                listener.push(frame)
+            while True:
+                await listener.ready.wait()
+                if listener.closed:
+                    break
+                listener.ready.clear()
+                while listener.pending:
+                    _, frame = listener.pending.popitem(last=False)
+                    data = json.dumps({'sensor': frame.sensor_name, 'etag': frame.etag, 'seq': frame.seq,
+                                       'url': f'/sensor/{urllib.parse.quote(frame.sensor_name)}.png'})
+                    writer.write(f'id: {frame.seq}\nevent: frame\ndata: {data}\n\n'.encode())
+                    await writer.drain()
+        finally:
+            self._listeners.discard(listener)
+
+    async def _respond(self, writer, status, body, headers=None):
+        lines = [f'HTTP/1.1 {status} {STATUS_TEXT[status]}', f'Content-Length: {len(body)}', 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(sensor_names, host='127.0.0.1', port=8080, ws_url=WS_BASE_URL, api_url=API_BASE_URL,
+                subscribe=True, register_timeout=10.0, smooth=False, render_workers=None):
+    """Run ingest + frame server until cancelled; sockets are registered before subscribing."""
+    ingest = IngestService(sensor_names, ws_url=ws_url)
+    async with FrameServer(ingest, host=host, port=port, smoothing={} if smooth else None,
+                           render_workers=render_workers) as server:
+        logger.info('Serving frames on http://%s:%s/', host, server.port)
+        if subscribe:
+            await asyncio.wait_for(asyncio.gather(*(ingest.connected[name].wait() for name in sensor_names)),
+                                   register_timeout)
+            for name in sensor_names:
+                ingest.mark_subscribed(name)
+            for result in await subscribe_many(sensor_names, api_url=api_url):
+                if not result.ok:
+                    logger.error('Subscription for %s failed: %s', result.sensor_name, result.error)
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve live occupancy frames over HTTP/SSE')
+    parser.add_argument('sensors', nargs='+', help='sensor names, e.g. InnoWing-9')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--ws-url', default=WS_BASE_URL)
+    parser.add_argument('--api-url', default=API_BASE_URL)
+    parser.add_argument('--smooth', action='store_true', help='track people and drop sub-cell jitter')
+    parser.add_argument('--render-workers', type=int, default=None,
+                        help='render on a pool of N workers, skipping to the newest update when behind')
+    args = parser.parse_args()
+    import logging
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(serve(args.sensors, args.host, args.port, args.ws_url, args.api_url, smooth=args.smooth,
+                      render_workers=args.render_workers))
@@ -0,0 +1,107 @@
+import os
+import struct
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# File layout: fixed header (magic, sequence number, unix timestamp, centroid count)
+# followed by `count` little-endian float64 (x, y) pairs.
+MAGIC = b'SVS1'
+HEADER = struct.Struct('<4sQdI')
+SUFFIX = '.snap'
+
+# Mode open() would give a new file; mkstemp's 0600 would otherwise survive the rename.
+# os.umask can only be read by setting it, so do that once, at import, rather than per write.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+class Snapshot(NamedTuple):
+    seq: int
+    timestamp: float
+    centroids: List[List[float]]
+
+
+def atomic_write(path, data: bytes):
+    """
+    Write `data` to a temp file next to `path` and rename it into place, so readers never see a
+    partial file. The result keeps the mode of the file it replaces (NEW_FILE_MODE for a new one).
+    """
+    path = Path(path)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SnapshotStore:
+    """
+    One snapshot file per sensor under `root`, published by write-to-temp-then-rename.
+    Every publish bumps a per-sensor sequence number stored in the file header, so
+    consumers can poll `changed()` by reading a few bytes instead of parsing centroids.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._seq = {}
+
+    def path(self, sensor_name) -> Path:
+        return self.root / f"{urllib.parse.quote(sensor_name, safe='')}{SUFFIX}"
+
+    def publish(self, sensor_name, centroids, timestamp: Optional[float] = None) -> int:
+        """Atomically replace the sensor's snapshot; returns the new sequence number."""
+        if sensor_name not in self._seq:
+            header = self.header(sensor_name)
+            self._seq[sensor_name] = header[0] if header else 0
+        seq = self._seq[sensor_name] + 1
+        points = np.asarray(centroids, dtype='<f8').reshape(-1, 2)
+        timestamp = time.time() if timestamp is None else timestamp
+        data = HEADER.pack(MAGIC, seq, timestamp, len(points)) + points.tobytes()
+        atomic_write(self.path(sensor_name), data)
+        self._seq[sensor_name] = seq
+        return seq
+
+    def header(self, sensor_name) -> Optional[Tuple[int, float]]:
+        """(seq, timestamp) of the latest snapshot, or None if the sensor has never published."""
+        try:
+            with open(self.path(sensor_name), 'rb') as file:
+                raw = file.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        magic, seq, timestamp, _ = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(f'{self.path(sensor_name)} is not a snapshot file')
+        return seq, timestamp
+
+    def changed(self, sensor_name, last_seq: int) -> bool:
+        header = self.header(sensor_name)
+        return header is not None and header[0] != last_seq
+
+    def read(self, sensor_name) -> Optional[Snapshot]:
+        try:
+            raw = self.path(sensor_name).read_bytes()
+        except FileNotFoundError:
+            return None
+        magic, seq, timestamp, count = HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f'{self.path(sensor_name)} is not a snapshot file')
+        points = np.frombuffer(raw, dtype='<f8', count=count * 2, offset=HEADER.size)
+        return Snapshot(seq, timestamp, points.reshape(-1, 2).tolist())
+
+    def sensors(self) -> List[str]:
+        return sorted(urllib.parse.unquote(p.name[:-len(SUFFIX)]) for p in self.root.glob(f'*{SUFFIX}'))
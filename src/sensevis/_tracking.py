@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List
+
+import numpy as np
+
+from ._metrics import FRAMES
+from ._post import CentroidUpdate
+from ._upscaler import RenderConfig, map_centroids
+
+
+@dataclass
+class Track:
+    track_id: int
+    position: np.ndarray  # smoothed (x, y) in live coordinates
+    emitted: np.ndarray  # grid position at the last emitted frame
+    missed: int = 0
+
+
+class CentroidTracker:
+    """
+    Follows people across centroid frames from one sensor.
+
+    Detections are matched to existing tracks greedily by nearest distance (gated at
+    `max_distance`, in live [1,32]x[1,24] units), matched tracks are smoothed with an
+    exponential moving average (`alpha` is the weight of the new detection), and a track
+    that goes unmatched survives `max_missed` frames at its last position before it is
+    dropped. `update()` returns True only when the smoothed frame is worth rendering: a
+    person appeared or left, or some track moved at least `min_move` grid cells from where
+    it was in the last emitted frame (cells of `config`'s grid, the default 10x8 if None).
+    """
+
+    def __init__(self, alpha: float = 0.5, max_distance: float = 6.0, max_missed: int = 2,
+                 min_move: float = 1.0, config: RenderConfig | None = None):
+        self.config = config
+        self.alpha = alpha
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.min_move = min_move
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """(N, 2) smoothed positions of the live tracks, oldest track first."""
+        return np.array([t.position for t in self.tracks], dtype=np.float64).reshape(-1, 2)
+
+    @property
+    def track_ids(self) -> np.ndarray:
+        return np.array([t.track_id for t in self.tracks], dtype=np.int64)
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, centroids) -> bool:
+        """Feed one frame of raw centroids; True if the smoothed frame should be emitted."""
+        points = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+        points = points[(points != 0).any(axis=1)]  # (0, 0) is the "nobody here" marker
+        changed = False
+
+        matched_tracks, matched_points = self._match(points)
+        for track_index, point_index in matched_tracks.items():
+            track = self.tracks[track_index]
+            track.position = track.position + self.alpha * (points[point_index] - track.position)
+            track.missed = 0
+
+        kept = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    changed = True
+                    continue
+            kept.append(track)
+        self.tracks = kept
+
+        for point_index in range(len(points)):
+            if point_index not in matched_points:
+                self.tracks.append(Track(self._next_id, points[point_index].copy(), np.full(2, np.nan)))
+                self._next_id += 1
+                changed = True
+
+        if not self.tracks:
+            return changed
+        grid = np.column_stack(map_centroids(self.centroids, self.config))
+        emitted = np.array([t.emitted for t in self.tracks])
+        if changed or (np.abs(grid - emitted) >= self.min_move).any():
+            for track, position in zip(self.tracks, grid):
+                track.emitted = position
+            return True
+        return False
+
+    def _match(self, points):
+        if not self.tracks or not len(points):
+            return {}, set()
+        positions = self.centroids
+        distances = np.hypot(positions[:, None, 0] - points[None, :, 0], positions[:, None, 1] - points[None, :, 1])
+        matched_tracks, matched_points = {}, set()
+        for flat in np.argsort(distances, axis=None, kind='stable'):
+            track_index, point_index = divmod(int(flat), len(points))
+            if distances[track_index, point_index] > self.max_distance:
+                break
+            if track_index in matched_tracks or point_index in matched_points:
+                continue
+            matched_tracks[track_index] = point_index
+            matched_points.add(point_index)
+        return matched_tracks, matched_points
+
+
+async def smooth_updates(updates: AsyncIterator[CentroidUpdate], **tracker_options) -> AsyncIterator[CentroidUpdate]:
+    """
+    Pass centroid updates through a CentroidTracker per sensor, yielding a smoothed update
+    (with `track_ids`) only when the tracker says the frame changed.
+    """
+    trackers: Dict[str, CentroidTracker] = {}
+    async for update in updates:
+        tracker = trackers.get(update.sensor_name)
+        if tracker is None:
+            tracker = trackers[update.sensor_name] = CentroidTracker(**tracker_options)
+        if tracker.update(update.centroids):
+            yield CentroidUpdate(update.sensor_name, tracker.centroids, update.received_at, tracker.track_ids,
+                                 update.sent_at)
+        else:
+            FRAMES.inc(result='suppressed')
@@ -1,22 +1,31 @@
-import csv
+import io
 import random
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple, Set
-import re
 
+import numpy as np
 from PIL import Image
 
+# parse_positions now lives with the streaming CSV reader; imported here for existing callers
+from ._csvframes import RowDiagnostic, iter_frames, parse_positions
+from ._metrics import FRAMES, RENDER_STAGE, get_logger
+
+logger = get_logger('upscaler')
+
 # Configuration
 import os
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 BASE_IMAGE_PATH = Path(os.path.join(root_dir, '8x10.png'))  # Base 10x8 background image
 CSV_PATH = Path('centroid.csv')     # CSV with centroid data
-OUTPUT_DIR = Path('bounding_box_gen')
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR = Path('bounding_box_gen')  # Created on first write, not at import
 
 # Pixel grid dimensions (width x height)
 GRID_W, GRID_H = 10, 8  # 10 columns, 8 rows
 COORD_MAX = 100  # Coordinates range from 1..100 inclusive
+UPSCALED_W, UPSCALED_H = 640, 480
+BLOCK_W, BLOCK_H = 64, 60  # Each 10x8 pixel becomes a 64x60 block
 
 BRIGHT_COLOR = (255, 248, 0)  # Bright yellow core (#fff800)
 # Greenish fade palette for first ring (original)
@@ -55,23 +64,6 @@ def blend(color, base, alpha):
     return tuple(int(round(alpha * c + (1 - alpha) * b)) for c, b in zip(color, base))
 
 
-def parse_positions(pos_str: str) -> List[float]:
-    """Convert comma-separated positions (optionally wrapped in braces/brackets) to float list."""
-    # Remove curly braces or square brackets if present
-    cleaned = re.sub(r'[\{\}\[\]]', '', pos_str)
-    vals: List[float] = []
-    for token in cleaned.split(','):
-        token = token.strip()
-        if not token:
-            continue
-        try:
-            vals.append(float(token))
-        except ValueError:
-            # Skip tokens that cannot be converted to float
-            continue
-    return vals
-
-
 def coord_to_pixel(x: float, y: float) -> Tuple[int, int]:
     """Map (x, y) in 1‒100 range to zero-based pixel indices on GRID_W × GRID_H grid."""
     # Clamp to [1, 100]
@@ -90,8 +82,9 @@ def coord_to_pixel(x: float, y: float) -> Tuple[int, int]:
 # Helper removed; using ring functions only
 
 
-def get_ring(px: int, py: int, radius: int) -> List[Tuple[int, int]]:
+def get_ring(px: int, py: int, radius: int, grid_size: Tuple[int, int] = (GRID_W, GRID_H)) -> List[Tuple[int, int]]:
     """Return pixel coordinates exactly `radius` Chebyshev distance from (px, py)."""
+    grid_w, grid_h = grid_size
     ring = []
     for dy in range(-radius, radius + 1):
         for dx in range(-radius, radius + 1):
@@ -100,337 +93,788 @@ def get_ring(px: int, py: int, radius: int) -> List[Tuple[int, int]]:
             if max(abs(dx), abs(dy)) != radius:
                 continue
             nx, ny = px + dx, py + dy
-            if 0 <= nx < GRID_W and 0 <= ny < GRID_H:
+            if 0 <= nx < grid_w and 0 <= ny < grid_h:
                 ring.append((nx, ny))
     return ring
 
 
-def main():
-    if not BASE_IMAGE_PATH.exists():
-        raise FileNotFoundError(f'Base image {BASE_IMAGE_PATH} not found.')
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f'CSV file {CSV_PATH} not found.')
+# --- Array-backed halo renderer ---
+BASE_YELLOW = (200, 180, 40)  # Dull yellow used for people near the edge of the room
+LIVE_COORD_RANGE = ((1, 32), (1, 24))  # Live sensor centroids: x in [1,32], y in [1,24]
+MAX_KERNEL_CELLS = 1024  # Largest grid whose halo kernels are precomputed (cells**2 entries)
+
+
+def blend_array(color, base, alpha):
+    """Array version of `blend`: same arithmetic and rounding, so results are identical."""
+    return np.rint(alpha * color + (1 - alpha) * base).astype(np.uint8)
+
+
+@dataclass(frozen=True)
+class Palette:
+    """Colours and blend weights used to draw people and their halos."""
+    bright: Tuple[int, int, int] = BRIGHT_COLOR  # person at the centre of the room
+    edge: Tuple[int, int, int] = BASE_YELLOW  # person at the edge of the room
+    faded: Tuple[Tuple[int, int, int], ...] = tuple(FADED_COLORS)  # first ring, one picked at random per cell
+    halo: Tuple[int, int, int] = LAYER2_COLOR  # outer rings
+    layer_blends: Tuple[float, ...] = (LAYER1_BLEND, LAYER2_BLEND, LAYER3_BLEND, LAYER4_BLEND)
+    corner_factor: float = CORNER_FACTOR
+
+
+class RenderConfig:
+    """
+    Geometry and palette for one kind of display: the grid size (w, h), the live coordinate
+    range ((x_min, x_max), (y_min, y_max)) stretched over it, the upscaled output size (w, h),
+    the Palette, and the 1..csv_coord_max range of CSV replays. A config that is only drawn on
+    in grid cells (e.g. a composite floor) can pass coord_range=None; it then has no coordinate
+    tables and can't map centroids itself.
+
+    Everything derived from those is computed once here: the block size, the halo kernels
+    for grids of up to MAX_KERNEL_CELLS cells (HALO_KERNELS[py, px] holds the Chebyshev
+    distance from (px, py) to every grid cell and CORNER_KERNELS[py, px] flags the cells on
+    one of its diagonals, so the ring and corner masks for any set of bright pixels come from
+    a single gather + reduction), the ring1 neighbour table, and, for integer coordinates,
+    lookup tables giving each coordinate's grid position and person colour. Configs are independent, so one process can render
+    several kinds of room side by side.
+    """
+
+    def __init__(self, grid_size: Tuple[int, int] = (GRID_W, GRID_H),
+                 coord_range=LIVE_COORD_RANGE,
+                 output_size: Tuple[int, int] = (UPSCALED_W, UPSCALED_H),
+                 palette: Palette | None = None, csv_coord_max: float = COORD_MAX):
+        self.grid_size = self.grid_w, self.grid_h = tuple(grid_size)
+        self.coord_range = tuple(tuple(r) for r in coord_range) if coord_range is not None else None
+        self.output_size = tuple(output_size)
+        self.palette = palette or Palette()
+        self.csv_coord_max = csv_coord_max
+        out_w, out_h = self.output_size
+        self.block_size = (max(1, out_w // self.grid_w), max(1, out_h // self.grid_h))
+        self.key = repr((self.grid_size, self.coord_range, self.output_size, self.palette, csv_coord_max)).encode()
+
+        if self.grid_w * self.grid_h <= MAX_KERNEL_CELLS:
+            cell_y, cell_x = np.mgrid[0:self.grid_h, 0:self.grid_w]
+            off_x = np.abs(cell_x[None, None, :, :] - cell_x[:, :, None, None])
+            off_y = np.abs(cell_y[None, None, :, :] - cell_y[:, :, None, None])
+            self.halo_kernels = np.maximum(off_x, off_y)
+            self.corner_kernels = off_x == off_y
+        else:
+            # Tables grow with cells squared; big grids (e.g. a whole floor) compute them per render
+            self.halo_kernels = self.corner_kernels = None
+        # (radius, blend weight) for each halo layer, innermost first
+        self.halo_layers = tuple(enumerate(self.palette.layer_blends, start=1))
+        self.no_layer = len(self.halo_layers) + 1  # Cells outside every halo keep the background
+        self.layer_weights = np.array([0.0] + list(self.palette.layer_blends) + [0.0])
+        self.ring1 = {(px, py): get_ring(px, py, 1, self.grid_size)
+                      for py in range(self.grid_h) for px in range(self.grid_w)}
+        self.cell_dtype = '<u2' if self.grid_w * self.grid_h <= 0x10000 else '<u4'
+
+        self.centre = ((self.grid_w - 1) / 2, (self.grid_h - 1) / 2)
+        self.max_dist = (self.centre[0] ** 2 + self.centre[1] ** 2) ** 0.5
+        self._bright = np.array(self.palette.bright)
+        self._edge = np.array(self.palette.edge)
+
+        if self.coord_range is not None and all(float(v).is_integer() for r in self.coord_range for v in r):
+            (x_min, x_max), (y_min, y_max) = self.coord_range
+            # Sensors mostly report whole numbers, which index straight into these tables
+            self.x_lut = self.grid_x(np.arange(x_min, x_max + 1, dtype=np.float64))
+            self.y_lut = self.grid_y(np.arange(y_min, y_max + 1, dtype=np.float64))
+            self.color_lut = self.person_colors(*np.meshgrid(self.x_lut, self.y_lut, indexing='ij'))
+        else:
+            self.x_lut = self.y_lut = self.color_lut = None
+
+    def __repr__(self):
+        return (f'RenderConfig(grid_size={self.grid_size}, coord_range={self.coord_range}, '
+                f'output_size={self.output_size})')
+
+    def _require_range(self):
+        if self.coord_range is None:
+            raise ValueError(f'{self!r} has no coordinate range; map centroids with the sensor config')
+
+    def grid_x(self, x: np.ndarray) -> np.ndarray:
+        self._require_range()
+        (x_min, x_max), _ = self.coord_range
+        return (x - x_min) / (x_max - x_min) * (self.grid_w - 1)
+
+    def grid_y(self, y: np.ndarray) -> np.ndarray:
+        self._require_range()
+        _, (y_min, y_max) = self.coord_range
+        return (y - y_min) / (y_max - y_min) * (self.grid_h - 1)
+
+    def person_colors(self, sx: np.ndarray, sy: np.ndarray) -> np.ndarray:
+        """Colour fades from bright to the edge colour with distance from the centre of the room."""
+        cx, cy = self.centre
+        dist = ((sx - cx) ** 2 + (sy - cy) ** 2) ** 0.5
+        alpha = 1 - np.minimum(dist / self.max_dist, 1.0)
+        return blend_array(self._bright, self._edge, alpha[..., None])
+
+    def upscale(self, frame: np.ndarray) -> np.ndarray:
+        return upscale(frame, self.block_size, self.output_size)
+
+
+DEFAULT_CONFIG = RenderConfig()  # The 10x8 room shown at 640x480
+
+# Tables of the default config, under their original names
+HALO_KERNELS = DEFAULT_CONFIG.halo_kernels
+CORNER_KERNELS = DEFAULT_CONFIG.corner_kernels
+HALO_LAYERS = DEFAULT_CONFIG.halo_layers
+NO_LAYER = DEFAULT_CONFIG.no_layer
+_LAYER_WEIGHTS = DEFAULT_CONFIG.layer_weights
+
+
+def _config(config: RenderConfig | None) -> RenderConfig:
+    return DEFAULT_CONFIG if config is None else config
+
+
+def map_centroids(centroids, config: RenderConfig | None = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Map live (x, y) centroids from [1,32]x[1,24] to float grid positions in [0,9]x[0,7]."""
+    config = _config(config)
+    pts = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+    return config.grid_x(pts[:, 0]), config.grid_y(pts[:, 1])
+
+
+def _spread(sx, sy, colors, config: RenderConfig):
+    grid_w, grid_h = config.grid_size
+    px0 = np.minimum(grid_w - 1, sx).astype(np.intp)
+    py0 = np.minimum(grid_h - 1, sy).astype(np.intp)
+    px1 = np.minimum(px0 + 1, grid_w - 1)
+    py1 = np.minimum(py0 + 1, grid_h - 1)
+    dx = sx - px0
+    dy = sy - py0
+
+    xs = np.stack([px0, px1, px0, px1], axis=1).ravel()
+    ys = np.stack([py0, py0, py1, py1], axis=1).ravel()
+    weights = np.stack([(1 - dx) * (1 - dy), dx * (1 - dy), (1 - dx) * dy, dx * dy], axis=1).ravel()
+    keep = ~(weights < 0.1)
+    return xs[keep], ys[keep], np.repeat(colors, 4, axis=0)[keep]
+
+
+def bright_cells(sx: np.ndarray, sy: np.ndarray,
+                 config: RenderConfig | None = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Spread each grid-space centroid over up to 4 pixels.
+    Returns (xs, ys, colors) in draw order, i.e. later entries overwrite earlier ones.
+    """
+    config = _config(config)
+    return _spread(sx, sy, config.person_colors(sx, sy), config)
+
+
+def centroid_cells(centroids, config: RenderConfig | None = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    bright_cells(*map_centroids(centroids)) with the same result, but whole-number
+    coordinates inside the config's range are looked up instead of computed.
+    """
+    config = _config(config)
+    pts = np.asarray(centroids, dtype=np.float64).reshape(-1, 2)
+    if config.x_lut is not None and len(pts):
+        ix = pts[:, 0] - config.coord_range[0][0]
+        iy = pts[:, 1] - config.coord_range[1][0]
+        if ((ix == np.floor(ix)).all() and (iy == np.floor(iy)).all()
+                and ix.min() >= 0 and iy.min() >= 0 and ix.max() < len(config.x_lut) and iy.max() < len(config.y_lut)):
+            ix, iy = ix.astype(np.intp), iy.astype(np.intp)
+            return _spread(config.x_lut[ix], config.y_lut[iy], config.color_lut[ix, iy], config)
+    return bright_cells(config.grid_x(pts[:, 0]), config.grid_y(pts[:, 1]), config)
+
+
+def _ring1_order(bright_pixels: Set[Tuple[int, int]], config: RenderConfig | None = None) -> List[Tuple[int, int]]:
+    """First-ring pixels in the order the faded colours are drawn from `random`."""
+    ring1 = _config(config).ring1
+    ring1_set: Set[Tuple[int, int]] = set()
+    for bp in bright_pixels:
+        ring1_set.update(ring1[bp])
+    return [p for p in ring1_set if p not in bright_pixels]
+
+
+@dataclass
+class HaloLayout:
+    """What every grid cell shows for one set of bright pixels, independent of the background."""
+    layer: np.ndarray  # grid_h x grid_w: 0 = bright, 1..4 = halo ring radius, no_layer = untouched
+    corner: np.ndarray  # grid_h x grid_w bool: ring cell lies on a bright pixel's diagonal
+    color: np.ndarray  # grid_h x grid_w x 3: person colour where layer == 0
+    bright_pixels: Set[Tuple[int, int]]  # insertion order fixes the ring1 colour draw order
+    config: RenderConfig | None = None  # None means DEFAULT_CONFIG
+
+
+def bright_key(xs: np.ndarray, ys: np.ndarray, colors: np.ndarray, config: RenderConfig | None = None) -> bytes:
+    """Canonical bytes for a set of bright pixels and their colours (last write wins, sorted by cell)."""
+    config = _config(config)
+    flat = ys * config.grid_w + xs
+    cells, last = np.unique(flat[::-1], return_index=True)
+    return cells.astype(config.cell_dtype).tobytes() + colors[len(flat) - 1 - last].tobytes()
+
+
+def halo_layout(xs: np.ndarray, ys: np.ndarray, colors: np.ndarray, config: RenderConfig | None = None) -> HaloLayout:
+    """Compute the bright/ring1..ring4 masks for all bright pixels at once."""
+    config = _config(config)
+    grid_w, grid_h = config.grid_size
+    layer = np.full((grid_h, grid_w), config.no_layer, dtype=np.int8)
+    corner = np.zeros((grid_h, grid_w), dtype=bool)
+    color = np.zeros((grid_h, grid_w, 3), dtype=np.uint8)
+    if len(xs) == 0:
+        return HaloLayout(layer, corner, color, set(), config)
+
+    # Last write wins for pixels shared by several people
+    flat = ys * grid_w + xs
+    _, last = np.unique(flat[::-1], return_index=True)
+    last = len(flat) - 1 - last
+    color[ys[last], xs[last]] = colors[last]
+
+    if config.halo_kernels is not None:
+        kernels, corners = config.halo_kernels[ys, xs], config.corner_kernels[ys, xs]
+    else:
+        off_x = np.abs(np.arange(grid_w)[None, None, :] - xs[:, None, None])
+        off_y = np.abs(np.arange(grid_h)[None, :, None] - ys[:, None, None])
+        kernels, corners = np.maximum(off_x, off_y), off_x == off_y
+    nearest = kernels.min(axis=0)
+    in_halo = nearest <= len(config.halo_layers)
+    layer[in_halo] = nearest[in_halo]
+    corner[:] = ((kernels == nearest) & corners).any(axis=0) & (nearest > 0) & in_halo
+    return HaloLayout(layer, corner, color, set(zip(xs.tolist(), ys.tolist())), config)
+
+
+def compose(frame: np.ndarray, layout: HaloLayout, rng: random.Random | None = None,
+            mask: np.ndarray | None = None) -> np.ndarray:
+    """
+    Paint `layout` onto `frame` in place, blending rings over what is already there.
+    With `mask`, only those cells are painted (and only their ring1 colours are drawn).
+    """
+    config = _config(layout.config)
+    cells = layout.layer != config.no_layer
+    if mask is not None:
+        cells &= mask
+    bright = cells & (layout.layer == 0)
+    frame[bright] = layout.color[bright]
+    ring = cells & (layout.layer > 0)
+    if not ring.any():
+        return frame
+
+    # Faded colours are drawn in the same order the set-based renderer used
+    overlay = np.empty_like(frame)
+    overlay[:] = config.palette.halo
+    choice = (rng or random).choice
+    for nx, ny in _ring1_order(layout.bright_pixels, config):
+        if ring[ny, nx]:
+            overlay[ny, nx] = choice(config.palette.faded)
+
+    weights = config.layer_weights[layout.layer]
+    blend_alpha = np.where(layout.corner, weights * config.palette.corner_factor, weights)
+    frame[ring] = blend_array(overlay[ring], frame[ring], blend_alpha[ring][:, None])
+    return frame
+
+
+def draw_people(frame: np.ndarray, sx: np.ndarray, sy: np.ndarray, rng: random.Random | None = None,
+                config: RenderConfig | None = None) -> np.ndarray:
+    """
+    Draw bright pixels and their 4 halo rings for every centroid at once onto `frame`
+    (grid_h x grid_w x 3 uint8, modified in place). Output matches the old per-pixel
+    renderer exactly for the same `random` state. Pass `rng` to draw the ring1 colours
+    from a private generator instead of the global one.
+    """
+    return compose(frame, halo_layout(*bright_cells(sx, sy, config), config), rng)
+
+
+# --- Block upscaler shared by every render path ---
+def upscale(frame: np.ndarray, block_size: Tuple[int, int] = (BLOCK_W, BLOCK_H),
+            output_size: Tuple[int, int] | None = (UPSCALED_W, UPSCALED_H)) -> np.ndarray:
+    """
+    Nearest-neighbour upscale of an HxWx3 frame: every grid pixel becomes a block_size (w, h) block.
+    The result is cropped or padded with black to output_size (w, h); pass None to keep the natural size.
+    """
+    block_w, block_h = block_size
+    upscaled = frame.repeat(block_h, axis=0).repeat(block_w, axis=1)
+    if output_size is None:
+        return upscaled
+    out_w, out_h = output_size
+    if upscaled.shape[:2] == (out_h, out_w):
+        return upscaled
+    canvas = np.zeros((out_h, out_w) + upscaled.shape[2:], dtype=upscaled.dtype)
+    h, w = min(out_h, upscaled.shape[0]), min(out_w, upscaled.shape[1])
+    canvas[:h, :w] = upscaled[:h, :w]
+    return canvas
+
+
+def save_upscaled(frame: np.ndarray, fp, format: str | None = None,
+                  block_size: Tuple[int, int] = (BLOCK_W, BLOCK_H),
+                  output_size: Tuple[int, int] | None = (UPSCALED_W, UPSCALED_H), **save_params):
+    """
+    Upscale `frame` and hand it straight to PIL's encoder.
+    `fp` may be a path or a writable binary file object (format is then required);
+    extra keyword arguments are passed on to Image.save.
+    """
+    Image.fromarray(upscale(frame, block_size, output_size)).save(fp, format=format, **save_params)
+
+
+def _write_png(upscaled: np.ndarray, path):
+    """Encode an already upscaled frame as PNG (PIL defaults) and write it, timing both stages."""
+    with RENDER_STAGE.time(stage='encode'):
+        buf = io.BytesIO()
+        Image.fromarray(upscaled).save(buf, format='PNG')
+    with RENDER_STAGE.time(stage='file_write'):
+        Path(path).write_bytes(buf.getvalue())
+
+
+def ensure_output_dir() -> Path:
+    """OUTPUT_DIR, created if needed. Only the disk-writing paths call this."""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    return OUTPUT_DIR
+
+
+# format -> (PIL format name, default save options)
+ENCODINGS = {
+    'png': ('PNG', {'compress_level': 1}),  # Fast zlib level; blocky frames still compress well
+    'webp': ('WEBP', {'lossless': True, 'quality': 0, 'method': 0}),
+    'jpeg': ('JPEG', {'quality': 90}),
+}
+
+
+def encode_frame(frame: np.ndarray, format: str = 'png', upscaled: bool = True,
+                 config: RenderConfig | None = None, **options):
+    """
+    Return a rendered 10x8 frame in memory, upscaled to 640x480 (or the `config` output size)
+    unless upscaled=False.
+    format is 'array' (numpy array), 'pil' (PIL image), 'raw' (packed RGB bytes) or an
+    encoded format from ENCODINGS ('png', 'webp', 'jpeg') whose save options, e.g.
+    compress_level or quality, can be overridden with keyword arguments.
+    """
+    image = _config(config).upscale(frame) if upscaled else frame
+    if format == 'array':
+        return image
+    if format == 'raw':
+        return np.ascontiguousarray(image).tobytes()
+    if format == 'pil':
+        return Image.fromarray(image)
+    if format not in ENCODINGS:
+        raise ValueError(f'Unknown image format {format!r}')
+    pil_format, defaults = ENCODINGS[format]
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format=pil_format, **{**defaults, **options})
+    return buf.getvalue()
+
+
+class BaseImage:
+    """
+    The 10x8 background, decoded and normalised once and kept as a read-only array.
+    The file is only re-read when its mtime changes; the upscaled blank frame is cached alongside it.
+    With a RenderConfig the image is fitted to that config's grid and output size instead, and
+    renderers drawing on this background use the same config. Safe to share between threads.
+    """
+
+    def __init__(self, path=BASE_IMAGE_PATH, config: RenderConfig | None = None):
+        self.path = Path(path)
+        self.config = _config(config)
+        self._mtime = None
+        self._frame = None
+        self._blank_png = None  # (frame it was encoded from, PNG bytes)
+        self._lock = threading.Lock()
+
+    def frame(self) -> np.ndarray:
+        """Return the grid_h x grid_w x 3 background (read-only; copy before drawing on it)."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f'Base image {self.path} not found.') from None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:  # another thread may have reloaded it meanwhile
+                    base_img = Image.open(self.path).convert('RGB')
+                    if base_img.size != self.config.grid_size:
+                        base_img = base_img.resize(self.config.grid_size, Image.Resampling.NEAREST)
+                    frame = np.array(base_img)
+                    frame.flags.writeable = False
+                    self._frame, self._mtime = frame, mtime
+        return self._frame
+
+    def blank_png(self) -> bytes:
+        """Encoded 640x480 PNG of the empty room."""
+        frame = self.frame()
+        with self._lock:
+            if self._blank_png is None or self._blank_png[0] is not frame:
+                buf = io.BytesIO()
+                save_upscaled(frame, buf, format='PNG', block_size=self.config.block_size,
+                              output_size=self.config.output_size)
+                self._blank_png = (frame, buf.getvalue())
+            return self._blank_png[1]
+
+
+_default_base = BaseImage()
+
+
+def iter_csv_rows(csv_path, on_diagnostic=None):
+    """
+    Yield (idx, xs, ys) for every usable row of a centroid CSV, streamed in chunks.
+    Skipped rows (and rows rendered without their non-numeric tokens) are reported to
+    `on_diagnostic` as RowDiagnostics.
+    """
+    for idx, xs, ys in iter_frames(csv_path, on_diagnostic=on_diagnostic):
+        yield idx, xs, ys
+
+
+def log_diagnostic(diag: RowDiagnostic):
+    action = 'skipping' if diag.skipped else 'ignoring them'
+    logger.warning('Row %s: %s (%s), %s.', diag.row, diag.reason, diag.detail, action)
+
+
+def render_csv_frame(base_frame: np.ndarray, xs, ys, rng: random.Random | None = None,
+                     config: RenderConfig | None = None) -> np.ndarray:
+    """Render one CSV row (coordinates in 1..100); each person is drawn (and haloed) on top of the previous ones."""
+    config = _config(config)
+    sx = (np.asarray(xs, dtype=np.float64) - 1) / config.csv_coord_max * config.grid_w
+    sy = (np.asarray(ys, dtype=np.float64) - 1) / config.csv_coord_max * config.grid_h
+    frame = base_frame.copy()
+    for i in range(len(sx)):
+        draw_people(frame, sx[i:i + 1], sy[i:i + 1], rng, config)
+    return frame
 
-    base_img = Image.open(BASE_IMAGE_PATH).convert('RGB')
-    if base_img.size != (GRID_W, GRID_H):
-        # Optionally resize background to expected grid; assume nearest neighbor to keep pixel art
-        base_img = base_img.resize((GRID_W, GRID_H), Image.Resampling.NEAREST)
+
+def save_csv_frame(frame: np.ndarray, idx: int, output_dir, config: RenderConfig | None = None) -> Tuple[Path, Path]:
+    """Write row `idx` as {idx+100}.png (10x8) and {idx+1}.png (640x480)."""
+    config = _config(config)
+    out_path = Path(output_dir) / f'{idx + 100}.png'
+    Image.fromarray(frame).save(out_path)
+    out_upscaled = Path(output_dir) / f'{idx + 1}.png'
+    save_upscaled(frame, out_upscaled, block_size=config.block_size, output_size=config.output_size)
+    return out_path, out_upscaled
+
+
+def main(path=None):
+    """Render every row of CSV_PATH, or of `path` (a centroid CSV or a history file), into OUTPUT_DIR."""
+    base_frame = _default_base.frame()
+    path = CSV_PATH if path is None else Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f'CSV file {path} not found.')
 
     # Read centroid data
-    with CSV_PATH.open(newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        for idx, row in enumerate(reader):
-            if not row or len(row) < 3:
-                continue  # Skip malformed rows
-            num_people = int(row[0])
-            xs = parse_positions(row[1])
-            ys = parse_positions(row[2])
-
-            # Safety check
-            if len(xs) != num_people or len(ys) != num_people:
-                print(f'Row {idx}: person count mismatch, skipping.')
-                continue
+    for idx, xs, ys, live in _source_rows(path, log_diagnostic):
+        frame = render_live_frame(base_frame, xs, ys) if live else render_csv_frame(base_frame, xs, ys)
+        out_path, out_upscaled = save_csv_frame(frame, idx, ensure_output_dir())
+        logger.debug('Saved %s', out_path)
+        logger.debug('Saved upscaled %s', out_upscaled)
+
+    logger.info('All images saved to %s', OUTPUT_DIR.resolve())
+
+
+# --- Parallel CSV replay ---
+_worker_base: np.ndarray | None = None
+_worker_config: RenderConfig | None = None
+
+
+def _row_rng(seed: int | None, idx: int) -> random.Random:
+    # Seeded per row (not per worker) so output doesn't depend on how rows were split up
+    return random.Random() if seed is None else random.Random(seed * 1_000_003 + idx)
+
+
+def _init_worker(base_frame: np.ndarray, config: RenderConfig | None = None):
+    global _worker_base, _worker_config
+    _worker_base, _worker_config = base_frame, config
+
+
+def render_live_frame(base_frame: np.ndarray, xs, ys, rng: random.Random | None = None,
+                      config: RenderConfig | None = None) -> np.ndarray:
+    """Render one frame of live coordinates ([1,32]x[1,24]) from separate x and y arrays."""
+    frame = base_frame.copy()
+    centroids = np.column_stack([xs, ys])
+    if not is_blank(centroids):
+        config = _config(config)
+        compose(frame, halo_layout(*centroid_cells(centroids, config), config), rng)
+    return frame
 
-            img = base_img.copy()
-            pixels = img.load()
-            if pixels is None:
-                raise RuntimeError('Failed to load image pixels.')
-
-            # Draw each person
-            cx, cy = (GRID_W - 1) / 2, (GRID_H - 1) / 2
-            max_dist = ((cx)**2 + (cy)**2) ** 0.5
-            for x, y in zip(xs, ys):
-                # --- Bright pixel distributed across up to 4 pixels ---
-                sx = (x - 1) / COORD_MAX * GRID_W
-                sy = (y - 1) / COORD_MAX * GRID_H
-
-                px0, py0 = int(min(GRID_W - 1, sx)), int(min(GRID_H - 1, sy))
-                px1 = min(px0 + 1, GRID_W - 1)
-                py1 = min(py0 + 1, GRID_H - 1)
-
-                dx = sx - px0
-                dy = sy - py0
-
-                # Calculate distance to center for color blending
-                dist = ((sx - cx) ** 2 + (sy - cy) ** 2) ** 0.5
-                norm = min(dist / max_dist, 1.0)
-                # Blend between a base color (dull yellow) and bright yellow
-                BASE_YELLOW = (200, 180, 40)
-                person_color = blend(BRIGHT_COLOR, BASE_YELLOW, 1 - norm)
-
-                coords_weights = [
-                    ((px0, py0), (1 - dx) * (1 - dy)),
-                    ((px1, py0), dx * (1 - dy)),
-                    ((px0, py1), (1 - dx) * dy),
-                    ((px1, py1), dx * dy),
-                ]
-
-                bright_pixels: Set[Tuple[int, int]] = set()
-
-                # Apply color with weight blending (strong weights use full color)
-                for (bx, by), w in coords_weights:
-                    if w < 0.1:
-                        continue
-                    pixels[bx, by] = person_color  # always set to person_color for visible weights
-                    bright_pixels.add((bx, by))
-
-                # --- Halo generation around bright pixels ---
-                ring1_set: Set[Tuple[int, int]] = set()
-
-                for bp in bright_pixels:
-                    ring1 = get_ring(*bp, radius=1)
-                    ring1_set.update(ring1)
-
-                # First faded layer
-                for nx, ny in ring1_set:
-                    if (nx, ny) in bright_pixels:
-                        continue
-                    if pixels is not None:
-                        base_col = pixels[nx, ny]
-                        is_corner = any(abs(nx - bx) == 1 and abs(ny - by) == 1 for bx, by in bright_pixels)
-                        blend_alpha = LAYER1_BLEND * CORNER_FACTOR if is_corner else LAYER1_BLEND
-                        faded_raw = random.choice(FADED_COLORS)
-                        new_col = blend(faded_raw, base_col, blend_alpha)
-                        pixels[nx, ny] = new_col
-
-                # Second faded layer (radius 2)
-                ring2_set: Set[Tuple[int, int]] = set()
-                for bp in bright_pixels:
-                    ring2_set.update(get_ring(*bp, radius=2))
-
-                for nx, ny in ring2_set:
-                    if (nx, ny) in bright_pixels or (nx, ny) in ring1_set:
-                        continue
-                    if pixels is not None:
-                        base_col = pixels[nx, ny]
-                        is_corner = any(abs(nx - bp[0]) == 2 and abs(ny - bp[1]) == 2 for bp in bright_pixels)
-                        blend_alpha = LAYER2_BLEND * CORNER_FACTOR if is_corner else LAYER2_BLEND
-                        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-                        pixels[nx, ny] = new_col
-
-                # Third faded layer (radius 3)
-                ring3_set: Set[Tuple[int, int]] = set()
-                for bp in bright_pixels:
-                    ring3_set.update(get_ring(*bp, radius=3))
-
-                for nx, ny in ring3_set:
-                    if (nx, ny) in bright_pixels or (nx, ny) in ring1_set or (nx, ny) in ring2_set:
-                        continue
-                    if pixels is not None:
-                        base_col = pixels[nx, ny]
-                        is_corner = any(abs(nx - bp[0]) == 3 and abs(ny - bp[1]) == 3 for bp in bright_pixels)
-                        blend_alpha = LAYER3_BLEND * CORNER_FACTOR if is_corner else LAYER3_BLEND
-                        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-                        pixels[nx, ny] = new_col
-
-                # Fourth faded layer (radius 4)
-                ring4_set: Set[Tuple[int, int]] = set()
-                for bp in bright_pixels:
-                    ring4_set.update(get_ring(*bp, radius=4))
-
-                for nx, ny in ring4_set:
-                    if (nx, ny) in bright_pixels or (nx, ny) in ring1_set or (nx, ny) in ring2_set or (nx, ny) in ring3_set:
-                        continue
-                    if pixels is not None:
-                        base_col = pixels[nx, ny]
-                        is_corner = any(abs(nx - bp[0]) == 4 and abs(ny - bp[1]) == 4 for bp in bright_pixels)
-                        blend_alpha = LAYER4_BLEND * CORNER_FACTOR if is_corner else LAYER4_BLEND
-                        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-                        pixels[nx, ny] = new_col
-
-            name = idx + 1
-            name1 = idx + 100
-
-            # Save image
-            out_path = OUTPUT_DIR / f'{name1}.png'
-            img.save(out_path)
-            print(f'Saved {out_path}')
-
-            # --- Custom upscale to 640x480 ---
-            UPSCALED_W, UPSCALED_H = 640, 480
-            BLOCK_W, BLOCK_H = 64, 60  # Each 10x8 pixel becomes a 64x60 block
-            upscaled = Image.new('RGB', (UPSCALED_W, UPSCALED_H), (0, 0, 0))
-            src_pixels = img.load()
-            up_pixels = upscaled.load()
-            if src_pixels is None or up_pixels is None:
-                raise RuntimeError('Failed to load upscaled image pixels.')
-            for gy in range(GRID_H):
-                for gx in range(GRID_W):
-                    color = src_pixels[gx, gy]
-                    for dy in range(BLOCK_H):
-                        for dx in range(BLOCK_W):
-                            ux = gx * BLOCK_W + dx
-                            uy = gy * BLOCK_H + dy
-                            up_pixels[ux, uy] = color
-            out_upscaled = OUTPUT_DIR / f'{name}.png'
-            upscaled.save(out_upscaled)
-            print(f'Saved upscaled {out_upscaled}')
-
-    print(f'All images saved to {OUTPUT_DIR.resolve()}')
-
-def generate_image_from_centroids(centroids: List[Tuple[float, float]], userInput):
+
+def _source_rows(path, on_diagnostic=None, start=None, end=None):
+    """(idx, xs, ys, live) for every frame of a centroid CSV or a history file (by suffix)."""
+    from . import _history
+
+    if Path(path).suffix != _history.SUFFIX:
+        for idx, xs, ys in iter_csv_rows(path, on_diagnostic):
+            yield idx, xs, ys, False
+        return
+    with _history.HistoryReader(path) as reader:
+        live = reader.space == _history.SPACE_LIVE
+        for frame in reader.frames(start, end):
+            yield reader.row_index(frame), frame.centroids[:, 0], frame.centroids[:, 1], live
+
+
+def _render_chunk(rows, output_dir, seed) -> int:
+    for idx, xs, ys, live in rows:
+        render = render_live_frame if live else render_csv_frame
+        frame = render(_worker_base, xs, ys, _row_rng(seed, idx), _worker_config)
+        save_csv_frame(frame, idx, output_dir, _worker_config)
+    return len(rows)
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_csv_batch(csv_path=None, output_dir=None, workers: int | None = None, seed: int | None = 0,
+                     chunk_rows: int = 64, max_pending: int | None = None, report_every: float = 5.0,
+                     base: BaseImage | None = None, on_diagnostic=log_diagnostic) -> int:
+    """
+    Replay a centroid CSV (default CSV_PATH) across a process pool, writing the same
+    {idx+1}.png / {idx+100}.png files as main() into output_dir (default OUTPUT_DIR).
+    Rows go to workers in chunks of `chunk_rows`; at most `max_pending` chunks (default 2 per worker)
+    are queued at once, so memory stays flat however large the CSV is. With a fixed `seed` the output
+    is identical for any number of workers; workers=0 renders in this process.
+    Prints progress every `report_every` seconds and returns the number of frames rendered.
+    Skipped rows are reported to `on_diagnostic` (logged by default).
+    A history file (see _history) can be given as csv_path too; render_history_batch also
+    takes a time range.
+    """
+    csv_path = CSV_PATH if csv_path is None else csv_path
+    if not Path(csv_path).exists():
+        raise FileNotFoundError(f'CSV file {csv_path} not found.')
+    return _render_rows(_source_rows(csv_path, on_diagnostic), output_dir, workers, seed, chunk_rows,
+                        max_pending, report_every, base)
+
+
+def render_history_batch(history_path, output_dir=None, start: float | None = None, end: float | None = None,
+                         workers: int | None = None, seed: int | None = 0, chunk_rows: int = 64,
+                         max_pending: int | None = None, report_every: float = 5.0,
+                         base: BaseImage | None = None) -> int:
+    """
+    Replay the frames of a history file recorded between `start` and `end` (unix times, both
+    optional) through the same process pool as render_csv_batch; frame n of the log is written
+    as {n+1}.png / {n+100}.png, except that a log made by csv_to_history uses each frame's source
+    row, so the files match render_csv_batch on that CSV. Returns the number of frames rendered.
+    """
+    if not Path(history_path).exists():
+        raise FileNotFoundError(f'History file {history_path} not found.')
+    return _render_rows(_source_rows(history_path, start=start, end=end), output_dir, workers, seed, chunk_rows,
+                        max_pending, report_every, base)
+
+
+def _render_rows(rows, output_dir, workers, seed, chunk_rows, max_pending, report_every, base) -> int:
+    import time
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    output_dir = OUTPUT_DIR if output_dir is None else output_dir
+    base = base or _default_base
+    base_frame = np.array(base.frame())
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    start = last_report = time.monotonic()
+    done = 0
+
+    def report(final=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if final or now - last_report >= report_every:
+            elapsed = now - start
+            logger.info('%d frames in %.1fs (%.1f frames/s)', done, elapsed, done / elapsed if elapsed else 0)
+            last_report = now
+
+    chunks = _chunked(rows, chunk_rows)
+    if workers == 0:
+        _init_worker(base_frame, base.config)
+        for rows in chunks:
+            done += _render_chunk(rows, output_dir, seed)
+            report()
+    else:
+        workers = workers or os.cpu_count() or 1
+        limit = max_pending or 2 * workers
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(base_frame, base.config)) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append(pool.submit(_render_chunk, rows, output_dir, seed))
+                # Wait on the oldest chunk so results are consumed in file order and the queue stays bounded
+                while len(pending) >= limit:
+                    done += pending.popleft().result()
+                    report()
+            while pending:
+                done += pending.popleft().result()
+                report()
+    report(final=True)
+    return done
+
+
+def is_blank(centroids) -> bool:
+    """True if there are no centroids or all of them are (0,0)."""
+    return len(centroids) == 0 or all(x == 0 and y == 0 for x, y in centroids)
+
+
+def render_frame(centroids, base: BaseImage | None = None, rng: random.Random | None = None) -> np.ndarray:
+    """
+    Render live centroids (x in [1,32], y in [1,24]) to a grid_h x grid_w x 3 frame without
+    touching the disk, using the base image's RenderConfig.
+    """
+    base = base or _default_base
+    frame = base.frame().copy()
+    if not is_blank(centroids):
+        compose(frame, halo_layout(*centroid_cells(centroids, base.config), base.config), rng)
+    return frame
+
+
+def render_csv_sequence(out_path, csv_path=None, fps: float = 5.0, seed: int | None = 0,
+                        base: BaseImage | None = None, on_diagnostic=log_diagnostic, **writer_options) -> int:
+    """
+    Replay a centroid CSV into a single animated APNG/GIF/WebP (chosen by out_path's suffix)
+    instead of two PNGs per row. Returns the number of rows rendered.
+    """
+    from ._animation import SequenceWriter
+
+    csv_path = CSV_PATH if csv_path is None else csv_path
+    base = base or _default_base
+    base_frame = base.frame()
+    writer_options.setdefault('block_size', base.config.block_size)
+    writer_options.setdefault('output_size', base.config.output_size)
+    rows = 0
+    with SequenceWriter(out_path, fps=fps, **writer_options) as writer:
+        for idx, xs, ys in iter_csv_rows(csv_path, on_diagnostic):
+            writer.append(render_csv_frame(base_frame, xs, ys, _row_rng(seed, idx), base.config))
+            rows += 1
+    return rows
+
+
+@dataclass
+class RenderStats:
+    frames_rendered: int = 0
+    frames_skipped: int = 0  # bright-pixel set unchanged, nothing re-rendered
+    cells_rendered: int = 0  # grid cells repainted across all rendered frames
+
+
+@dataclass
+class _SensorFrame:
+    key: bytes
+    layout: HaloLayout
+    background: np.ndarray
+    frame: np.ndarray
+    upscaled: np.ndarray
+
+
+class IncrementalRenderer:
+    """
+    Keeps the last bright-pixel set and rendered frame for each sensor. If a new set of
+    centroids quantises to the same bright pixels the previous frame is returned untouched;
+    otherwise only the grid cells whose halo footprint changed are repainted, both in the
+    10x8 frame and in its 640x480 upscale. Geometry and palette come from the base image's
+    RenderConfig.
+    The returned arrays belong to the renderer and are updated in place on the next change.
+    Not thread-safe (stats, rng): when rendering on a pool, give each sensor its own renderer.
+    """
+
+    def __init__(self, base: BaseImage | None = None, rng: random.Random | None = None):
+        self.base = base or _default_base
+        self.config = self.base.config
+        self.rng = rng
+        self.stats = RenderStats()
+        self._last: dict = {}
+
+    def forget(self, sensor):
+        self._last.pop(sensor, None)
+
+    def render(self, sensor, centroids) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """Return (frame, upscaled, changed) for the sensor's latest centroids."""
+        with RENDER_STAGE.time(stage='base_load'):
+            background = self.base.frame()
+        config = self.config
+        with RENDER_STAGE.time(stage='centroid_mapping'):
+            if is_blank(centroids):
+                xs = ys = np.empty(0, dtype=np.intp)
+                colors = np.empty((0, 3), dtype=np.uint8)
+            else:
+                xs, ys, colors = centroid_cells(centroids, config)
+            key = bright_key(xs, ys, colors, config)
+
+        last = self._last.get(sensor)
+        if last is not None and last.key == key and last.background is background:
+            self.stats.frames_skipped += 1
+            FRAMES.inc(result='skipped')
+            return last.frame, last.upscaled, False
+
+        if last is None or last.background is not background:
+            with RENDER_STAGE.time(stage='halo_rings'):
+                layout = halo_layout(xs, ys, colors, config)
+                frame = background.copy()
+                compose(frame, layout, self.rng)
+            with RENDER_STAGE.time(stage='upscale'):
+                upscaled = config.upscale(frame)
+            changed_cells = config.grid_w * config.grid_h
+        else:
+            frame, upscaled = last.frame, last.upscaled
+            with RENDER_STAGE.time(stage='halo_rings'):
+                layout = halo_layout(xs, ys, colors, config)
+                changed = ((layout.layer != last.layout.layer) | (layout.corner != last.layout.corner)
+                           | ((layout.layer == 0) & (layout.color != last.layout.color).any(axis=2)))
+                frame[changed] = background[changed]
+                compose(frame, layout, self.rng, changed)
+            block_w, block_h = config.block_size
+            with RENDER_STAGE.time(stage='upscale'):
+                for gy, gx in zip(*np.nonzero(changed)):
+                    upscaled[gy * block_h:(gy + 1) * block_h, gx * block_w:(gx + 1) * block_w] = frame[gy, gx]
+            changed_cells = int(changed.sum())
+
+        self._last[sensor] = _SensorFrame(key, layout, background, frame, upscaled)
+        self.stats.frames_rendered += 1
+        FRAMES.inc(result='rendered')
+        self.stats.cells_rendered += changed_cells
+        return frame, upscaled, True
+
+
+def generate_image_from_centroids(centroids: List[Tuple[float, float]], userInput, save_grid: bool = True,
+                                  base: BaseImage | None = None, cache=None):
     """
     Generate a pixelized image from a list of (x, y) centroids (x in [1,32], y in [1,24]),
     using 8x10.png as the base, and save as bounding_box_gen/live.png.
     If no centroids are given or all centroids are (0,0), generates a blank image.
+    With save_grid=False the 10x8 frame goes straight to the upscaler and ignore.png is not written.
+    `base` is the cached background to draw on (defaults to the shared 8x10.png cache).
+    With a RenderCache as `cache`, {userInput}.png is written from the cached PNG bytes and
+    ignore.png is skipped; the cache renders on its own `cache.base`, so passing a different
+    `base` as well raises ValueError.
     """
+    if cache is not None:
+        if base is not None and base is not cache.base:
+            raise ValueError('cache renders on cache.base; pass the same BaseImage as base or leave it out')
+        base = cache.base
+    base = base or _default_base
+    if cache is not None and not is_blank(centroids):
+        (ensure_output_dir() / f'{userInput}.png').write_bytes(cache.png(centroids))
+        return
     # Check if centroids is empty or contains only (0,0) coordinates
-    if not centroids or all(x == 0 and y == 0 for x, y in centroids):
-        print("No valid centroids detected, generating blank image...")
-        generate_blank(userInput)
+    if is_blank(centroids):
+        logger.debug("No valid centroids detected, generating blank image...")
+        generate_blank(userInput, base)
         # Still create the live.png file as a blank image
-        if not BASE_IMAGE_PATH.exists():
-            raise FileNotFoundError(f'Base image {BASE_IMAGE_PATH} not found.')
-        base_img = Image.open(BASE_IMAGE_PATH).convert('RGB')
-        if base_img.size != (GRID_W, GRID_H):
-            base_img = base_img.resize((GRID_W, GRID_H), Image.Resampling.NEAREST)
-        out_path = OUTPUT_DIR / 'live.png'
-        base_img.save(out_path)
-        print(f'Saved blank {out_path}')
+        out_path = ensure_output_dir() / 'live.png'
+        Image.fromarray(base.frame()).save(out_path)
+        logger.debug('Saved blank %s', out_path)
         return
-    
-    if not BASE_IMAGE_PATH.exists():
-        raise FileNotFoundError(f'Base image {BASE_IMAGE_PATH} not found.')
-
-    base_img = Image.open(BASE_IMAGE_PATH).convert('RGB')
-    if base_img.size != (GRID_W, GRID_H):
-        base_img = base_img.resize((GRID_W, GRID_H), Image.Resampling.NEAREST)
-
-    img = base_img.copy()
-    pixels = img.load()
-    if pixels is None:
-        raise RuntimeError('Failed to load image pixels.')
-
-    # Map input range [1,32]x[1,24] to [0,9]x[0,7]
-    def map_coord(x, y):
-        sx = (x - 1) / 31 * (GRID_W - 1)  # 0..9
-        sy = (y - 1) / 23 * (GRID_H - 1)  # 0..7
-        return sx, sy
-
-    cx, cy = (GRID_W - 1) / 2, (GRID_H - 1) / 2
-    max_dist = ((cx)**2 + (cy)**2) ** 0.5
-
-    bright_pixels: Set[Tuple[int, int]] = set()
-    for x, y in centroids:
-        sx, sy = map_coord(x, y)
-        px0, py0 = int(min(GRID_W - 1, sx)), int(min(GRID_H - 1, sy))
-        px1 = min(px0 + 1, GRID_W - 1)
-        py1 = min(py0 + 1, GRID_H - 1)
-        dx = sx - px0
-        dy = sy - py0
-        dist = ((sx - cx) ** 2 + (sy - cy) ** 2) ** 0.5
-        norm = min(dist / max_dist, 1.0)
-        BASE_YELLOW = (200, 180, 40)
-        person_color = blend(BRIGHT_COLOR, BASE_YELLOW, 1 - norm)
-        coords_weights = [
-            ((px0, py0), (1 - dx) * (1 - dy)),
-            ((px1, py0), dx * (1 - dy)),
-            ((px0, py1), (1 - dx) * dy),
-            ((px1, py1), dx * dy),
-        ]
-        for (bx, by), w in coords_weights:
-            if w < 0.1:
-                continue
-            pixels[bx, by] = person_color
-            bright_pixels.add((bx, by))
 
-    # Halo layers
-    ring1_set: Set[Tuple[int, int]] = set()
-    for bp in bright_pixels:
-        ring1_set.update(get_ring(*bp, radius=1))
-    for nx, ny in ring1_set:
-        if (nx, ny) in bright_pixels:
-            continue
-        base_col = pixels[nx, ny]
-        is_corner = any(abs(nx - bx) == 1 and abs(ny - by) == 1 for bx, by in bright_pixels)
-        blend_alpha = LAYER1_BLEND * CORNER_FACTOR if is_corner else LAYER1_BLEND
-        faded_raw = random.choice(FADED_COLORS)
-        new_col = blend(faded_raw, base_col, blend_alpha)
-        pixels[nx, ny] = new_col
-    ring2_set: Set[Tuple[int, int]] = set()
-    for bp in bright_pixels:
-        ring2_set.update(get_ring(*bp, radius=2))
-    for nx, ny in ring2_set:
-        if (nx, ny) in bright_pixels or (nx, ny) in ring1_set:
-            continue
-        base_col = pixels[nx, ny]
-        is_corner = any(abs(nx - bp[0]) == 2 and abs(ny - bp[1]) == 2 for bp in bright_pixels)
-        blend_alpha = LAYER2_BLEND * CORNER_FACTOR if is_corner else LAYER2_BLEND
-        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-        pixels[nx, ny] = new_col
-    ring3_set: Set[Tuple[int, int]] = set()
-    for bp in bright_pixels:
-        ring3_set.update(get_ring(*bp, radius=3))
-    for nx, ny in ring3_set:
-        if (nx, ny) in bright_pixels or (nx, ny) in ring1_set or (nx, ny) in ring2_set:
-            continue
-        base_col = pixels[nx, ny]
-        is_corner = any(abs(nx - bp[0]) == 3 and abs(ny - bp[1]) == 3 for bp in bright_pixels)
-        blend_alpha = LAYER3_BLEND * CORNER_FACTOR if is_corner else LAYER3_BLEND
-        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-        pixels[nx, ny] = new_col
-    ring4_set: Set[Tuple[int, int]] = set()
-    for bp in bright_pixels:
-        ring4_set.update(get_ring(*bp, radius=4))
-    for nx, ny in ring4_set:
-        if (nx, ny) in bright_pixels or (nx, ny) in ring1_set or (nx, ny) in ring2_set or (nx, ny) in ring3_set:
-            continue
-        base_col = pixels[nx, ny]
-        is_corner = any(abs(nx - bp[0]) == 4 and abs(ny - bp[1]) == 4 for bp in bright_pixels)
-        blend_alpha = LAYER4_BLEND * CORNER_FACTOR if is_corner else LAYER4_BLEND
-        new_col = blend(LAYER2_COLOR, base_col, blend_alpha)
-        pixels[nx, ny] = new_col
-
-    # Save image
-    out_path = OUTPUT_DIR / 'ignore.png'
-    img.save(out_path)
-    print(f'Saved {out_path}')
-
-    # --- Custom upscale to 640x480 ---
-    UPSCALED_W, UPSCALED_H = 640, 480
-    BLOCK_W, BLOCK_H = 64, 60  # Each 10x8 pixel becomes a 64x60 block
-    upscaled = Image.new('RGB', (UPSCALED_W, UPSCALED_H), (0, 0, 0))
-    src_pixels = img.load()
-    up_pixels = upscaled.load()
-    if src_pixels is None or up_pixels is None:
-        raise RuntimeError('Failed to load upscaled image pixels.')
-    for gy in range(GRID_H):
-        for gx in range(GRID_W):
-            color = src_pixels[gx, gy]
-            for dy in range(BLOCK_H):
-                for dx in range(BLOCK_W):
-                    ux = gx * BLOCK_W + dx
-                    uy = gy * BLOCK_H + dy
-                    up_pixels[ux, uy] = color
-    out_upscaled = OUTPUT_DIR / f'{userInput}.png'
-    upscaled.save(out_upscaled)
+    # render_frame, split into the standard stages
+    with RENDER_STAGE.time(stage='base_load'):
+        frame = base.frame().copy()
+    with RENDER_STAGE.time(stage='centroid_mapping'):
+        cells = centroid_cells(centroids, base.config)
+    with RENDER_STAGE.time(stage='halo_rings'):
+        compose(frame, halo_layout(*cells, base.config))
+    FRAMES.inc(result='rendered')
+
+    if save_grid:
+        # Save image
+        out_path = ensure_output_dir() / 'ignore.png'
+        Image.fromarray(frame).save(out_path)
+        logger.debug('Saved %s', out_path)
+
+    # --- Upscale to 640x480 ---
+    out_upscaled = ensure_output_dir() / f'{userInput}.png'
+    with RENDER_STAGE.time(stage='upscale'):
+        upscaled = base.config.upscale(frame)
+    _write_png(upscaled, out_upscaled)
     #print(f'Saved upscaled {out_upscaled}')
 
-def generate_blank(userInput):
-    base_img = Image.open(BASE_IMAGE_PATH).convert('RGB')
-    if base_img.size != (GRID_W, GRID_H):
-        base_img = base_img.resize((GRID_W, GRID_H), Image.Resampling.NEAREST)
-
-    img = base_img.copy()
-
-    UPSCALED_W, UPSCALED_H = 640, 480
-    BLOCK_W, BLOCK_H = 64, 60  # Each 10x8 pixel becomes a 64x60 block
-    upscaled = Image.new('RGB', (UPSCALED_W, UPSCALED_H), (0, 0, 0))
-    src_pixels = img.load()
-    up_pixels = upscaled.load()
-    if src_pixels is None or up_pixels is None:
-        raise RuntimeError('Failed to load upscaled image pixels.')
-    for gy in range(GRID_H):
-        for gx in range(GRID_W):
-            color = src_pixels[gx, gy]
-            for dy in range(BLOCK_H):
-                for dx in range(BLOCK_W):
-                    ux = gx * BLOCK_W + dx
-                    uy = gy * BLOCK_H + dy
-                    up_pixels[ux, uy] = color
-    out_upscaled = OUTPUT_DIR / f'{userInput}.png'
-    upscaled.save(out_upscaled)
+def generate_blank(userInput, base: BaseImage | None = None):
+    base = base or _default_base
+    out_upscaled = ensure_output_dir() / f'{userInput}.png'
+    out_upscaled.write_bytes(base.blank_png())
     #print(f'Saved blank {out_upscaled}')
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    import logging
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main(sys.argv[1] if len(sys.argv) > 1 else None) 
\ No newline at end of file
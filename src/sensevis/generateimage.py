@@ -1,5 +1,59 @@
-from ._upscaler import generate_image_from_centroids
+from pathlib import Path
+
+from PIL import Image
+
+from ._snapshot import atomic_write
+from ._upscaler import (BASE_IMAGE_PATH, BaseImage, IncrementalRenderer, _write_png, encode_frame, ensure_output_dir,
+                        generate_image_from_centroids, is_blank, render_frame)
 
 class ImageGenerator:
+    def __init__(self, base_image_path=BASE_IMAGE_PATH, config=None):
+        # Background is decoded once and reloaded only if the file changes on disk.
+        # `config` (a RenderConfig) sets the grid, coordinate range, output size and palette.
+        self.base = BaseImage(base_image_path, config)
+        # Remembers the last frame per sensor (userInput) so unchanged occupancy isn't re-rendered
+        self.renderer = IncrementalRenderer(self.base)
+
+    @property
+    def stats(self):
+        """RenderStats with frames_rendered / frames_skipped / cells_rendered counters."""
+        return self.renderer.stats
+
     def generate_image(self, centroids, userInput):
-        generate_image_from_centroids(centroids, userInput)
\ No newline at end of file
+        frame, upscaled, changed = self.renderer.render(userInput, centroids)
+        if not changed:
+            return
+        if is_blank(centroids):
+            generate_image_from_centroids(centroids, userInput, base=self.base)
+            return
+        out_path = ensure_output_dir() / 'ignore.png'
+        Image.fromarray(frame).save(out_path)
+        _write_png(upscaled, ensure_output_dir() / f'{userInput}.png')
+
+    def render(self, centroids, format='png', upscaled=True, sink=None, **options):
+        """
+        Render centroids in memory and return the frame as format 'png' (fast zlib level by
+        default), 'webp', 'jpeg', 'raw' RGB bytes, a numpy 'array' or a 'pil' image.
+        Encoder options such as compress_level or quality are passed through.
+        Encoded bytes can also be written to `sink` (a path, replaced atomically, or a binary file object).
+        """
+        result = encode_frame(render_frame(centroids, self.base), format, upscaled, self.base.config, **options)
+        if sink is not None:
+            if not isinstance(result, bytes):
+                raise ValueError(f'Cannot write format {format!r} to a sink')
+            if isinstance(sink, (str, Path)):
+                atomic_write(sink, result)
+            else:
+                sink.write(result)
+        return result
+
+    def render_frame(self, centroids):
+        """Render centroids to a grid-sized (10x8 by default) RGB array (nothing is written to disk)."""
+        return render_frame(centroids, self.base)
+
+    def open_sequence(self, path, fps=5.0, **options):
+        """Animated APNG/GIF/WebP writer; append frames from render_frame, e.g. seq.append(gen.render_frame(c))."""
+        from ._animation import SequenceWriter
+        options.setdefault('block_size', self.base.config.block_size)
+        options.setdefault('output_size', self.base.config.output_size)
+        return SequenceWriter(path, fps=fps, **options)
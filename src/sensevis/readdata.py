@@ -1,7 +1,19 @@
+import asyncio
 import subprocess
 import time
 
+import websockets
+
+from . import _post, _send
+from ._metrics import FIRST_BBOX
+
 class SenseScraper:
+    def __init__(self, api_url=_send.API_BASE_URL, ws_url=_post.WS_BASE_URL, http_client=None):
+        self.api_url = api_url
+        self.ws_url = ws_url
+        # Optional shared httpx.AsyncClient for the subscribe POST
+        self.http_client = http_client
+
     def write_bbox(self, aPath, sensor_num):
         print('hello')
         """Start both testpost.py and sendrequest.py for a specific sensor"""
@@ -24,4 +36,30 @@ class SenseScraper:
         subprocess.Popen([
             'osascript', '-e',
             f'tell app "Terminal" to do script "{sendrequest_cmd}"'
-        ])
\ No newline at end of file
+        ])
+
+    async def fetch_bbox(self, sensor_num, timeout=10.0):
+        """
+        Register the WebSocket, then subscribe, in one event loop, and return the first
+        reading's centroids ([[x, y], ...], empty if nobody is in the room).
+        """
+        sensor_name = f"InnoWing-{sensor_num}"
+        uri = _post.register_uri(sensor_name, self.ws_url)
+        async with websockets.connect(uri) as websocket:
+            # The socket is registered once connect() returns, so the subscription can't race it
+            receiver = asyncio.create_task(_post.receive_centroids(websocket))
+            try:
+                subscribed_at = time.monotonic()
+                response = await _send.send_request_async(sensor_name, self.http_client, self.api_url)
+                if response is None or response.is_error:
+                    status = None if response is None else response.status_code
+                    raise ConnectionError(f'Subscription for {sensor_name} failed (status {status})')
+                centroids = await asyncio.wait_for(receiver, timeout)
+                FIRST_BBOX.observe(time.monotonic() - subscribed_at, sensor=sensor_name)
+                return centroids
+            finally:
+                receiver.cancel()
+
+    def read_bbox(self, sensor_num, timeout=10.0):
+        """Blocking wrapper around fetch_bbox: no extra processes, terminals or data.json."""
+        return asyncio.run(self.fetch_bbox(sensor_num, timeout))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from sensevis._animation import SequenceWriter
+
+
+def frames():
+    a = np.zeros((8, 10, 3), dtype=np.uint8)
+    b = a.copy()
+    b[2, 3] = (255, 248, 0)
+    return [a, a, b, a]
+
+
+@pytest.mark.parametrize('suffix', ['.png', '.gif', '.webp'])
+def test_sequence_writer_merges_repeats_and_upscales(tmp_path, suffix):
+    path = tmp_path / f'replay{suffix}'
+    with SequenceWriter(path, fps=10, output_size=None, block_size=(4, 4)) as writer:
+        for frame in frames():
+            writer.append(frame)
+    assert writer.frames_written == 3
+
+    with Image.open(path) as img:
+        assert img.n_frames == 3
+        assert img.size == (40, 32)
+        durations = []
+        for i in range(img.n_frames):
+            img.seek(i)
+            img.load()
+            durations.append(img.info['duration'])
+            if i == 1:
+                assert img.convert('RGB').getpixel((13, 9))[:2] == (255, 248)
+        assert durations == [200, 100, 100]
+
+
+def test_apng_streams_frames_as_they_arrive(tmp_path):
+    path = tmp_path / 'replay.apng'
+    writer = SequenceWriter(path, fps=5)
+    a, _, b, _ = frames()
+    writer.append(a)
+    writer.append(b)  # flushes the first frame to disk
+    assert path.stat().st_size > 0
+    writer.close()
+    with Image.open(path) as img:
+        assert img.format == 'PNG' and img.n_frames == 2
@@ -0,0 +1,70 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from sensevis import _upscaler
+from sensevis._cache import RenderCache
+from sensevis._upscaler import BaseImage
+
+
+def test_cache_hits_on_same_layout_and_is_deterministic(tmp_path):
+    cache = RenderCache(maxsize=2)
+    first = cache.png([(26, 4), (3, 7)])
+    assert cache.png([[26, 4], [3, 7]]) is first
+    # Same bright pixels in a different order is the same layout
+    assert cache.png([(3, 7), (26, 4)]) is first
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+    assert Image.open(io.BytesIO(first)).size == (640, 480)
+
+    # Deterministic seed: a fresh cache renders identical bytes
+    assert RenderCache().png([(26, 4), (3, 7)]) == first
+    assert RenderCache(seed=1).key([(26, 4), (3, 7)]) != cache.key([(26, 4), (3, 7)])
+
+
+@pytest.mark.parametrize('centroids', [[(3, 17), (29, 4)], [(18, 23), (18, 4)], [(24, 21), (7, 19), (32, 5)]])
+def test_render_does_not_depend_on_centroid_order(centroids):
+    # Same key either way, so the bytes must match whichever order was rendered first
+    assert RenderCache().png(centroids) == RenderCache().png(centroids[::-1])
+
+
+def test_cache_is_lru_bounded_and_survives_restart_on_disk(tmp_path):
+    cache = RenderCache(maxsize=2, disk_dir=tmp_path)
+    for c in ([(1, 1)], [(16, 12)], [(32, 24)]):
+        cache.png(c)
+    assert len(cache) == 2
+    assert len(list(tmp_path.glob('*.png'))) == 3
+
+    restarted = RenderCache(maxsize=2, disk_dir=tmp_path)
+    data = restarted.png([(1, 1)])
+    assert restarted.stats.disk_hits == 1 and restarted.stats.misses == 0
+    assert data == cache.png([(1, 1)])
+
+
+def test_disk_tier_is_pruned_least_recently_used_first(tmp_path):
+    cache = RenderCache(maxsize=1, disk_dir=tmp_path, disk_max_bytes=None)
+    layouts = ([(1, 1)], [(16, 12)], [(32, 24)], [(8, 20)])
+    for i, c in enumerate(layouts[:3]):
+        cache.png(c)
+        os.utime(tmp_path / f'{cache.key(c)}.png', ns=(i, i))
+    cache.disk_max_bytes = sum(p.stat().st_size for p in tmp_path.glob('*.png'))
+    cache.png([(1, 1)])  # disk hit: (1, 1) becomes the most recently used file
+    cache.png(layouts[3])  # over the cap: prune to 3/4 of it, oldest first
+    kept = {p.stem for p in tmp_path.glob('*.png')}
+    assert kept == {cache.key([(1, 1)]), cache.key(layouts[3])}
+
+
+def test_generate_with_cache_rejects_a_different_base():
+    with pytest.raises(ValueError):
+        _upscaler.generate_image_from_centroids([(26, 4)], 'x', base=BaseImage(), cache=RenderCache())
+
+
+def test_disk_tier_leaves_other_files_alone(tmp_path):
+    frame = tmp_path / 'InnoWing-9.png'
+    frame.write_bytes(b'x' * 100_000)
+    cache = RenderCache(maxsize=1, disk_dir=tmp_path, disk_max_bytes=1)
+    assert cache._disk_bytes == 0
+    cache.png([(1, 1)])  # over the cap: prunes its own files only
+    assert [p.name for p in tmp_path.iterdir()] == ['InnoWing-9.png']
+    assert frame.stat().st_size == 100_000
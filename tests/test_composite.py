@@ -0,0 +1,94 @@
+import io
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sensevis import _upscaler
+from sensevis._composite import CompositeRenderer, FloorLayout, SensorPlacement
+
+
+def test_layout_rotation_matches_rotated_frames():
+    layout = FloorLayout([SensorPlacement('A', 0, 0), SensorPlacement('B', 10, 0, rotation=90),
+                          SensorPlacement('C', 0, 10, rotation=180)])
+    assert layout.size == (18, 18)
+    frame = np.zeros((_upscaler.GRID_H, _upscaler.GRID_W), dtype=int)
+    frame[1, 2] = 1
+    for name, x, y in [('B', 10, 0), ('C', 0, 10)]:
+        rotated = FloorLayout.rotate(frame, layout.placements[name].rotation)
+        fx, fy = layout.to_floor(name, np.array([2]), np.array([1]))
+        ry, rx = np.argwhere(rotated == 1)[0]
+        assert (fx[0], fy[0]) == (x + rx, y + ry)
+    with pytest.raises(ValueError):
+        FloorLayout([SensorPlacement('A', 0, 0, rotation=45)])
+
+
+def test_composite_renders_one_canvas_and_reencodes_dirty_tiles_only():
+    layout = FloorLayout([SensorPlacement('InnoWing-1', 0, 0), SensorPlacement('InnoWing-2', 10, 0),
+                          SensorPlacement('InnoWing-3', 0, 8, rotation=180)])
+    renderer = CompositeRenderer(layout, rng=random.Random(0))
+    assert renderer.tiles_shape == (2, 2)
+
+    renderer.update('InnoWing-1', [(26, 4)])
+    assert sorted(renderer.render()) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert renderer.canvas.shape == (16 * 60, 20 * 64, 3)
+    assert renderer.stats.tiles_encoded == 4
+
+    # Sensor 1's cells look like a standalone render, and its halo spills over into sensor 2
+    alone = _upscaler.halo_layout(*_upscaler.centroid_cells([(26, 4)]))
+    assert np.array_equal(renderer._layout.layer[:8, :10], alone.layer)
+    assert np.array_equal(renderer._layout.color[:8, :10], alone.color)
+    assert (renderer._layout.layer[:6, 10:13] < _upscaler.NO_LAYER).all()
+
+    # A person on sensor 2 only dirties the tiles its halo reaches
+    renderer.update('InnoWing-2', [(30, 20)])
+    assert renderer.render() == [(1, 0), (1, 1)]
+    assert renderer.render() == []
+    assert renderer.stats.tiles_skipped >= 4
+
+    tile = Image.open(io.BytesIO(renderer.tiles[(1, 0)]))
+    assert tile.size == (640, 480)
+    left, top, right, bottom = renderer.tile_bounds(1, 0)
+    assert np.array_equal(np.array(tile), renderer.canvas[top:bottom, left:right])
+
+    # Uncovered floor (bottom-right) is black outside the halos; the whole canvas can be encoded at once
+    assert (renderer.frame[11:, 10:] == 0).all()
+    assert Image.open(io.BytesIO(renderer.encode())).size == (1280, 960)
+    with pytest.raises(KeyError):
+        renderer.update('InnoWing-9', [(1, 1)])
+
+
+def test_large_floor_uses_on_the_fly_halo_kernels():
+    placements = [SensorPlacement(f'S{i}', (i % 6) * 10, (i // 6) * 8) for i in range(24)]
+    layout = FloorLayout(placements)
+    renderer = CompositeRenderer(layout, rng=random.Random(0))
+    assert renderer.floor_config.halo_kernels is None
+    renderer.update('S7', [(16, 12)])
+    renderer.render()
+
+    small = _upscaler.RenderConfig(grid_size=(60, 32))
+    small_layout = _upscaler.halo_layout(np.array([14]), np.array([11]), np.array([[1, 2, 3]], dtype=np.uint8), small)
+    small.halo_kernels = small.corner_kernels = None
+    computed = _upscaler.halo_layout(np.array([14]), np.array([11]), np.array([[1, 2, 3]], dtype=np.uint8), small)
+    assert np.array_equal(small_layout.layer, computed.layer) and np.array_equal(small_layout.corner, computed.corner)
+
+
+def test_tiles_follow_rotated_footprints_and_overlaps_are_rejected():
+    # B is rotated, so its footprint is 8 wide and 10 tall
+    layout = FloorLayout([SensorPlacement('A', 0, 0), SensorPlacement('B', 10, 0, rotation=90)])
+    assert layout.footprints['B'] == (10, 0, 18, 10)
+    renderer = CompositeRenderer(layout, rng=random.Random(0))
+    assert renderer.x_edges == [0, 10, 18] and renderer.y_edges == [0, 8, 10]
+    assert renderer.floor_config.coord_range is None and renderer.floor_config.x_lut is None
+    renderer.update('B', [(16, 12)])
+    renderer.render()
+    # B is exactly tiles (1, 0) + (1, 1): no tile straddles A and B
+    assert renderer.tile_bounds(1, 0) == (640, 0, 1152, 480) and renderer.tile_bounds(1, 1) == (640, 480, 1152, 600)
+
+    uniform = CompositeRenderer(layout, tile_size=(6, 6))
+    assert uniform.x_edges == [0, 6, 12, 18] and uniform.y_edges == [0, 6, 10]
+
+    with pytest.raises(ValueError, match='overlaps A'):
+        FloorLayout([SensorPlacement('A', 0, 0), SensorPlacement('B', 9, 7, rotation=270)])
+    FloorLayout([SensorPlacement('A', 0, 0), SensorPlacement('B', 0, 8)])  # touching is fine
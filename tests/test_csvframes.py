@@ -0,0 +1,37 @@
+import numpy as np
+
+from sensevis._csvframes import iter_frames, parse_positions
+
+
+def test_parse_positions_matches_legacy_rules():
+    assert parse_positions('{12.5, 40,}') == [12.5, 40.0]
+    assert parse_positions('[3,x,7]') == [3.0, 7.0]
+    assert parse_positions('{}') == []
+
+
+def test_iter_frames_streams_chunks_and_reports_diagnostics(tmp_path):
+    path = tmp_path / 'centroid.csv'
+    path.write_text(
+        '2,"{10,20}","[30,40]"\n'
+        '1,"{50}","[60,70]"\n'
+        '\n'
+        'two,"{1}","[1]"\n'
+        '0,"{}","[]"\n'
+        '1,"{5,oops}","[6]"\n'
+        '1,"{8}"\n'
+        '3,"{1,2,3}","[4,5,6]"\n'
+        '2,"{1,bad}","[4,5]"\n'
+    )
+    diagnostics = []
+    frames = list(iter_frames(path, chunk_rows=3, on_diagnostic=diagnostics.append))
+
+    assert [f.idx for f in frames] == [0, 4, 5, 7]
+    assert frames[0].xs.tolist() == [10, 20] and frames[0].ys.tolist() == [30, 40]
+    assert frames[1].xs.size == 0 and frames[1].xs.dtype == np.float64
+    assert frames[2].xs.tolist() == [5] and frames[2].ys.tolist() == [6]
+    assert frames[3].ys.tolist() == [4, 5, 6]
+    assert [(d.row, d.reason) for d in diagnostics] == [
+        (1, 'count-mismatch'), (3, 'bad-count'), (5, 'bad-token'), (6, 'short-row'), (8, 'count-mismatch')]
+    # Only the rendered bad-token row is reported as not skipped, and row 8 is reported once
+    assert [d.skipped for d in diagnostics] == [True, True, False, True, True]
+    assert 'non-numeric' in diagnostics[-1].detail
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from sensevis import _decode
+
+
+def envelope(bboxes, **payload):
+    return {'payload': {'bboxes': bboxes, **payload}}
+
+
+def test_messages_without_bboxes_are_not_parsed(monkeypatch):
+    def fail(message):
+        raise AssertionError('parsed a message without bboxes')
+
+    monkeypatch.setattr(_decode, 'loads', fail)
+    assert _decode.decode_frames('{"payload": {"status": "ok"}}') == []
+    assert _decode.decode_centroids(b'{"type": "heartbeat"}') is None
+
+
+def test_decode_single_and_ragged_messages():
+    message = json.dumps(envelope([[0, 0, 26, 4, 0.9], [0, 0, 3, 7, 0.8]]))
+    assert _decode.decode_centroids(message).tolist() == [[26, 4], [3, 7]]
+    assert _decode.decode_centroids(message.encode()).dtype == np.float64
+
+    ragged = json.dumps(envelope([[1, 2, 3, 4, 0.9], [9, 9], [5, 6, 0.7]]))
+    assert _decode.decode_centroids(ragged).tolist() == [[3, 4], [5, 6]]
+    assert _decode.decode_centroids(json.dumps(envelope([]))).shape == (0, 2)
+
+    # Only x and y are converted; labels or ids in the other fields don't matter
+    labelled = json.dumps(envelope([[1, 2, 10, 12, 'person'], ['id-7', 0, 3, 7, None]]))
+    assert _decode.decode_centroids(labelled).tolist() == [[10, 12], [3, 7]]
+    assert _decode.decode_centroids(memoryview(labelled.encode())).tolist() == [[10, 12], [3, 7]]
+
+
+def test_decode_batched_and_compact_messages():
+    batch = json.dumps([envelope([[0, 0, 1, 1, 0.9]]), {'payload': {}}, envelope([[0, 0, 2, 2, 0.9]])])
+    assert [f.tolist() for f in _decode.decode_frames(batch)] == [[[1, 1]], [[2, 2]]]
+    stamped = json.dumps([{'payload': {'bboxes': [[0, 0, 1, 1, 0.9]], 'sent_at': 1700000000.5}},
+                          {'payload': {'bboxes': [], 'sent_at': 'yesterday'}}])
+    assert [sent_at for _, sent_at in _decode.decode_payloads(stamped)] == [1700000000.5, None]
+
+    ndjson = '\n'.join(json.dumps(envelope([[0, 0, x, x, 0.9]])) for x in (3, 4, 5))
+    assert [f.tolist() for f in _decode.decode_frames(ndjson)] == [[[3, 3]], [[4, 4]], [[5, 5]]]
+    assert _decode.decode_centroids(ndjson).tolist() == [[5, 5]]
+
+    compact = json.dumps(envelope([0, 0, 26, 4, 0.9, 0, 0, 3, 7, 0.8]))
+    assert _decode.decode_centroids(compact).tolist() == [[26, 4], [3, 7]]
+    labelled = json.dumps(envelope([0, 0, 26, 4, 'person', 0, 0, 3, 7, 'person']))
+    assert _decode.decode_centroids(labelled).tolist() == [[26, 4], [3, 7]]
+    short = json.dumps(envelope([26, 4, 0.9, 3, 7, 0.8], bbox_len=3))
+    assert _decode.decode_centroids(short).tolist() == [[26, 4], [3, 7]]
+    assert _decode.decode_centroid_values(compact) == [[26, 4], [3, 7]]
+    assert _decode.decode_centroid_values(ndjson) == [[5, 5]]
+    assert _decode.decode_centroid_values('{"payload": {"status": "ok"}}') is None
+
+
+def test_malformed_messages_raise():
+    with pytest.raises(ValueError):
+        _decode.decode_frames('{"payload": {"bboxes": [')
+    with pytest.raises(ValueError):
+        _decode.decode_frames(json.dumps(envelope([1, 2, 3, 4])))
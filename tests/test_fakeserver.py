@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from sensevis._fakeserver import FakeSenseAI
+from sensevis._post import IngestService
+from sensevis._send import subscribe_many
+
+
+def test_ingest_against_fake_server_streams_and_reconnects():
+    async def scenario():
+        async with FakeSenseAI(rate=50, people=2, disconnect_every=3, seed=1) as fake:
+            names = ['InnoWing-9', 'InnoWing-2']
+            ingest = IngestService(names, ws_url=fake.ws_url, backoff_initial=0.01, backoff_max=0.05)
+            async with ingest:
+                await asyncio.wait_for(asyncio.gather(*(ingest.connected[n].wait() for n in names)), 5)
+                results = await subscribe_many(names, api_url=fake.api_url)
+                assert all(result.ok for result in results)
+                seen = {}
+                updates = ingest.updates()
+                while min(len(seen.get(n, [])) for n in names) < 8:
+                    update = await asyncio.wait_for(anext(updates), 5)
+                    seen.setdefault(update.sensor_name, []).append(update.centroids)
+                    assert update.sent_at is not None and update.sent_at <= time.time()
+            return fake, ingest, seen
+
+    fake, ingest, seen = asyncio.run(scenario())
+    assert fake.subscribed == {'InnoWing-9', 'InnoWing-2'}
+    assert fake.stats.disconnects >= 2 and all(count >= 1 for count in ingest.reconnects.values())
+    for frames in seen.values():
+        assert all(frame.shape == (2, 2) for frame in frames)
+        points = np.concatenate(frames)
+        assert (points[:, 0] >= 1).all() and (points[:, 0] <= 32).all()
+        assert (points[:, 1] >= 1).all() and (points[:, 1] <= 24).all()
+
+
+def test_fake_server_rejects_bad_requests():
+    async def scenario():
+        async with FakeSenseAI() as fake:
+            async with httpx.AsyncClient(base_url=fake.api_url) as client:
+                ok = await client.post('/api/subscribe/occupancy', params={'topic': 'senseai/Lab-1/tx'})
+                bad_topic = await client.post('/api/subscribe/occupancy', params={'topic': 'Lab-1'})
+                wrong_method = await client.get('/api/subscribe/occupancy')
+                missing = await client.post('/nope')
+            message = json.loads(fake.message('Lab-1'))
+            return fake, ok, bad_topic, wrong_method, missing, message
+
+    fake, ok, bad_topic, wrong_method, missing, message = asyncio.run(scenario())
+    assert ok.status_code == 200 and ok.json()['topic'] == 'senseai/Lab-1/tx'
+    assert (bad_topic.status_code, wrong_method.status_code, missing.status_code) == (400, 405, 404)
+    assert fake.subscribed == {'Lab-1'}
+    assert len(message['payload']['bboxes']) == 3 and message['payload']['seq'] == 1
+
+
+def test_base_urls_come_from_environment():
+    src = str(Path(__file__).resolve().parents[1] / 'src')
+    env = {**os.environ, 'PYTHONPATH': src, 'SENSEVIS_API_URL': 'http://127.0.0.1:8001/',
+           'SENSEVIS_WS_URL': 'ws://127.0.0.1:8002'}
+    code = ('from sensevis import _post, _send; '
+            'print(_send.subscribe_url("Lab-1")); print(_post.register_uri("Lab-1"))')
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['http://127.0.0.1:8001/api/subscribe/occupancy?topic=senseai/Lab-1/tx',
+                                  'ws://127.0.0.1:8002/ws/register?clientId=python-client-Lab-1']
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from sensevis import _history, _upscaler
+from sensevis._history import (FILE_HEADER, SPACE_CSV, HistoryReader, HistoryStore, HistoryWriter, csv_to_history,
+                               index_path)
+
+
+def test_append_seek_and_recover(tmp_path):
+    path = tmp_path / 'InnoWing-9.svh'
+    with HistoryWriter(path, index_every=4) as writer:
+        for i in range(10):
+            writer.append([[i + 1, i + 2]] * (i % 3), timestamp=100.0 + i)
+        with pytest.raises(ValueError):
+            writer.append([], timestamp=50.0)
+
+    with HistoryReader(path) as reader:
+        assert len(reader.index) == 3
+        frames = list(reader)
+        assert [f.seq for f in frames] == list(range(10))
+        assert frames[5].centroids.tolist() == [[6.0, 7.0], [6.0, 7.0]]
+        assert [f.seq for f in reader.frames(start=104.5, end=107)] == [5, 6, 7]
+        assert reader.frame_at(106.9).seq == 6
+        assert reader.frame_at(99) is None
+        assert reader.frame_at(1e9).seq == 9
+
+    # A torn append (crash mid-record) is cut off when the log is reopened
+    size = path.stat().st_size
+    with open(path, 'ab') as file:
+        file.write(b'\x00' * 7)
+    with HistoryWriter(path) as writer:
+        assert writer.seq == 10 and writer.index_every == 4
+        assert writer.append([[3, 3]], timestamp=200.0) == 10
+    assert path.stat().st_size == size + 12 + 8
+    with HistoryReader(path) as reader:
+        assert reader.frame_at(200).centroids.tolist() == [[3.0, 3.0]]
+        assert len(reader.index) == 3
+
+
+def test_wall_clock_stepping_back_is_clamped(tmp_path, monkeypatch):
+    clock = iter([500.0, 400.0, 600.0])
+    monkeypatch.setattr(_history.time, 'time', lambda: next(clock))
+    with HistoryWriter(tmp_path / 'InnoWing-9.svh') as writer:
+        for _ in range(3):
+            writer.append([[1, 1]])
+    with HistoryReader(tmp_path / 'InnoWing-9.svh') as reader:
+        assert [f.timestamp for f in reader] == [500.0, 500.0, 600.0]
+
+
+def test_store_appends_per_sensor(tmp_path):
+    store = HistoryStore(tmp_path)
+    for i in range(3):
+        store.append('InnoWing-9', np.array([[26.0, 4.0]]), timestamp=float(i))
+    store.append('InnoWing-3', [], timestamp=0.0)
+    with store.reader('InnoWing-9') as reader:
+        assert [f.timestamp for f in reader] == [0.0, 1.0, 2.0]
+    store.close()
+    assert store.sensors() == ['InnoWing-3', 'InnoWing-9']
+    assert store.path('InnoWing-3').stat().st_size == FILE_HEADER.size + 12
+    assert index_path(store.path('InnoWing-3')).exists()
+
+
+def test_csv_history_replays_through_the_batch_renderer(tmp_path):
+    csv_path = tmp_path / 'centroid.csv'
+    csv_path.write_text('2,"{10,80.5}","[20,60]"\n'
+                        '2,"{10}","[20]"\n'  # count mismatch: skipped by both replays
+                        '0,"{}","[]"\n'
+                        '1,"{50}","[50]"\n')
+    history = tmp_path / 'centroid.svh'
+    assert csv_to_history(csv_path, history, fps=2.0, start=1000.0, on_diagnostic=lambda d: None) == 3
+    with HistoryReader(history) as reader:
+        assert reader.space == SPACE_CSV
+        assert [f.timestamp for f in reader] == [1000.0, 1001.0, 1001.5]
+        assert [reader.row_index(f) for f in reader] == [0, 2, 3]
+
+    from_csv, from_history = tmp_path / 'csv', tmp_path / 'history'
+    assert _upscaler.render_csv_batch(csv_path, from_csv, workers=0, seed=3, on_diagnostic=lambda d: None) == 3
+    assert _upscaler.render_history_batch(history, from_history, workers=0, seed=3) == 3
+    assert sorted(p.name for p in from_csv.iterdir()) == sorted(p.name for p in from_history.iterdir())
+    for name in ('1.png', '3.png', '4.png', '100.png'):
+        assert (from_csv / name).read_bytes() == (from_history / name).read_bytes()
+
+    later = tmp_path / 'later'
+    assert _upscaler.render_history_batch(history, later, start=1001.0, workers=0) == 2
+    assert sorted(p.name for p in later.iterdir()) == ['102.png', '103.png', '3.png', '4.png']
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import websockets
+
+from sensevis._metrics import ERRORS
+from sensevis._post import IngestService, extract_centroids
+
+
+def bbox_message(*centroids):
+    return json.dumps({'payload': {'bboxes': [[0, 0, x, y, 0.9] for x, y in centroids]}})
+
+
+def test_extract_centroids():
+    assert extract_centroids(json.dumps({'payload': {'status': 'ok'}})) is None
+    assert extract_centroids(bbox_message()) == []
+    centroids = extract_centroids(bbox_message((3, 7), (26, 4.5)))
+    assert centroids == [[3, 7], [26, 4.5]]
+    # data.json keeps the values as sent: [[3, 7], ...], not [[3.0, 7.0], ...]
+    assert json.dumps(centroids) == '[[3, 7], [26, 4.5]]'
+
+
+def test_ingest_streams_and_reconnects():
+    async def scenario():
+        connections = []
+
+        async def handler(websocket):
+            connections.append(websocket.request.path)
+            if len(connections) == 1:
+                await websocket.send(json.dumps({'payload': {}}))
+                await websocket.send(bbox_message((3, 7)))
+                await websocket.send(bbox_message((4, 8), (10, 10)))
+                return  # drop the connection; the service should come back
+            await websocket.send(bbox_message())
+            await websocket.wait_closed()
+
+        async with websockets.serve(handler, 'localhost', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            service = IngestService(['InnoWing-9'], ws_url=f'ws://localhost:{port}', backoff_initial=0.01)
+            async with service:
+                updates = [await asyncio.wait_for(service.queue.get(), 5) for _ in range(3)]
+
+        assert [u.centroids.tolist() for u in updates] == [[[3, 7]], [[4, 8], [10, 10]], []]
+        assert all(u.sensor_name == 'InnoWing-9' for u in updates)
+        assert connections[0] == '/ws/register?clientId=python-client-InnoWing-9'
+        assert service.reconnects['InnoWing-9'] >= 1
+
+    asyncio.run(scenario())
+
+
+def test_history_failure_does_not_stop_ingest():
+    class BrokenHistory:
+        def append(self, sensor_name, centroids):
+            raise ValueError('timestamp went backwards')
+
+    async def scenario():
+        async def handler(websocket):
+            await websocket.send(bbox_message((3, 7)))
+            await websocket.send(bbox_message((4, 8)))
+            await websocket.wait_closed()
+
+        async with websockets.serve(handler, 'localhost', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            service = IngestService(['InnoWing-9'], ws_url=f'ws://localhost:{port}', history=BrokenHistory())
+            async with service:
+                updates = [await asyncio.wait_for(service.queue.get(), 5) for _ in range(2)]
+        assert [u.centroids.tolist() for u in updates] == [[[3, 7]], [[4, 8]]]
+        assert service.reconnects['InnoWing-9'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_malformed_bboxes_are_skipped_not_fatal():
+    async def scenario():
+        async def handler(websocket):
+            await websocket.send(json.dumps({'payload': {'bboxes': {'0': [0, 0, 3, 7, 0.9]}}}))
+            await websocket.send(json.dumps({'payload': {'bboxes': 'none'}}))
+            await websocket.send(bbox_message((4, 8)))
+            await websocket.wait_closed()
+
+        async with websockets.serve(handler, 'localhost', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            service = IngestService(['InnoWing-9'], ws_url=f'ws://localhost:{port}')
+            decode_errors = ERRORS.value(component='decode')
+            async with service:
+                update = await asyncio.wait_for(service.queue.get(), 5)
+        assert update.centroids.tolist() == [[4, 8]]
+        assert ERRORS.value(component='decode') == decode_errors + 2
+        assert service.reconnects['InnoWing-9'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_failure_does_not_drop_the_connection():
+    class FullDisk:
+        def publish(self, sensor_name, centroids):
+            raise OSError(28, 'No space left on device')
+
+    async def scenario():
+        async def handler(websocket):
+            await websocket.send(bbox_message((3, 7)))
+            await websocket.send(bbox_message((4, 8)))
+            await websocket.wait_closed()
+
+        async with websockets.serve(handler, 'localhost', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            service = IngestService(['InnoWing-9'], ws_url=f'ws://localhost:{port}', store=FullDisk())
+            snapshot_errors = ERRORS.value(component='snapshot')
+            async with service:
+                updates = [await asyncio.wait_for(service.queue.get(), 5) for _ in range(2)]
+        assert [u.centroids.tolist() for u in updates] == [[[3, 7]], [[4, 8]]]
+        assert ERRORS.value(component='snapshot') == snapshot_errors + 2
+        assert service.reconnects['InnoWing-9'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+import httpx
+
+from sensevis import _upscaler
+from sensevis._metrics import METRICS, RENDER_STAGE, RENDER_STAGES, RateLimitFilter, Registry
+from sensevis._server import FrameServer
+from sensevis.generateimage import ImageGenerator
+
+
+def test_registry_renders_prometheus_text_and_calls_hooks():
+    registry = Registry()
+    seen = []
+    registry.add_hook(lambda name, labels, value: seen.append((name, labels, value)))
+    errors = registry.counter('errors_total', 'Errors', ['component'])
+    latency = registry.histogram('latency_seconds', 'Latency', ['sensor'], buckets=(0.1, 1.0))
+
+    errors.inc(component='ingest')
+    errors.inc(2, component='ingest')
+    latency.observe(0.05, sensor='a')
+    latency.observe(0.5, sensor='a')
+    latency.observe(3.0, sensor='a')
+
+    assert errors.value(component='ingest') == 3
+    assert latency.count(sensor='a') == 3
+    assert registry.counter('errors_total', 'Errors', ['component']) is errors
+    text = registry.render()
+    assert '# TYPE errors_total counter' in text
+    assert 'errors_total{component="ingest"} 3' in text
+    assert 'latency_seconds_bucket{sensor="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{sensor="a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{sensor="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{sensor="a"} 3' in text
+    assert seen[0] == ('errors_total', {'component': 'ingest'}, 1)
+    assert len(seen) == 5
+
+
+def test_rate_limit_filter_drops_repeats_and_reports_them():
+    limiter = RateLimitFilter(burst=2, interval=60.0)
+
+    def record(msg, *args):
+        return logging.LogRecord('sensevis.test', logging.WARNING, __file__, 1, msg, args, None)
+
+    lost = '%s: connection lost (%s)'
+    results = [limiter.filter(record(lost, 'InnoWing-9', f'error {i}')) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    assert limiter.filter(record('other message'))
+    # Same template for another sensor has its own window
+    assert limiter.filter(record(lost, 'InnoWing-2', 'error'))
+
+    limiter._windows[('sensevis.test', lost, repr('InnoWing-9'))][0] -= 60.0
+    resumed = record(lost, 'InnoWing-9', 'error')
+    assert limiter.filter(resumed)
+    assert '3 similar messages suppressed' in resumed.msg
+
+
+def test_frame_server_exposes_metrics():
+    async def scenario():
+        async with FrameServer(port=0) as server:
+            server.publish('InnoWing-9', [(10, 12)])
+            async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{server.port}', timeout=5) as client:
+                response = await client.get('/metrics')
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain')
+        assert 'sensevis_render_stage_seconds_count{stage="encode"}' in response.text
+        assert 'sensevis_frames_total{result="rendered"}' in response.text
+
+    asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert METRICS.render().startswith('# HELP')
+
+
+def test_render_paths_use_only_the_standard_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(_upscaler, 'OUTPUT_DIR', tmp_path)
+    stages = set()
+
+    def hook(name, labels, value):
+        if name == RENDER_STAGE.name:
+            stages.add(labels['stage'])
+
+    METRICS.add_hook(hook)
+    try:
+        _upscaler.generate_image_from_centroids([(26, 4)], 'legacy')
+        generator = ImageGenerator()
+        generator.generate_image([(3, 7)], 'incremental')
+        FrameServer(port=0).publish('InnoWing-9', [(10, 12)])
+    finally:
+        METRICS.remove_hook(hook)
+    assert stages == set(RENDER_STAGES)
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parents[1] / 'src')
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import sensevis
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ('numpy', 'PIL', 'httpx', 'websockets', 'sensevis._upscaler') if m in sys.modules)
+generator = sensevis.ImageGenerator
+print(json.dumps({{'elapsed': elapsed, 'heavy': heavy, 'dir': dir(sensevis),
+                   'generator': generator.__module__, 'upscaler': 'sensevis._upscaler' in sys.modules}}))
+'''
+
+
+def test_import_is_lazy_cheap_and_side_effect_free(tmp_path):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(src=SRC)], cwd=tmp_path,
+                            capture_output=True, text=True, check=True)
+    probe = json.loads(result.stdout)
+    assert probe['heavy'] == []
+    assert probe['elapsed'] < 0.05  # budget: nothing but the package __init__ runs
+    assert {'ImageGenerator', 'SenseScraper'} <= set(probe['dir'])
+    assert probe['generator'] == 'sensevis.generateimage' and probe['upscaler']
+    assert list(tmp_path.iterdir()) == []  # nothing written to the working directory
+
+
+def test_unknown_attribute_raises():
+    import sensevis
+    try:
+        sensevis.nope
+    except AttributeError as e:
+        assert 'nope' in str(e)
+    else:
+        raise AssertionError('expected AttributeError')
@@ -0,0 +1,29 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from sensevis import ImageGenerator
+
+
+def test_render_formats_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gen = ImageGenerator()
+    centroids = [(26, 4), (3, 7)]
+
+    array = gen.render(centroids, format='array')
+    assert array.shape == (480, 640, 3) and array.dtype == np.uint8
+    assert gen.render(centroids, format='array', upscaled=False).shape == (8, 10, 3)
+    assert len(gen.render(centroids, format='raw')) == 640 * 480 * 3
+    assert gen.render(centroids, format='pil').size == (640, 480)
+
+    png = gen.render([], format='png', compress_level=9)
+    assert Image.open(io.BytesIO(png)).format == 'PNG'
+    webp = gen.render(centroids, format='webp')
+    assert Image.open(io.BytesIO(webp)).format == 'WEBP'
+
+    # Disk output only happens through an explicit sink
+    sink = tmp_path / 'frame.png'
+    data = gen.render(centroids, sink=sink)
+    assert sink.read_bytes() == data
+    assert not (tmp_path / 'bounding_box_gen').exists()
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+from sensevis._metrics import RENDER_DROPPED
+from sensevis._scheduler import RenderScheduler
+from sensevis._server import FrameServer
+
+
+def test_scheduler_coalesces_per_sensor_and_caps_in_flight():
+    gate = threading.Event()
+    started, rendered, results = [], [], []
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def render(name, centroids):
+        with lock:
+            started.append((name, centroids))
+            running.append(name)
+            peak[0] = max(peak[0], len(running))
+        gate.wait(5)
+        with lock:
+            running.remove(name)
+            rendered.append((name, centroids))
+        return f'{name}:{centroids}'
+
+    async def scenario():
+        dropped_before = RENDER_DROPPED.value(sensor='a')
+        async with RenderScheduler(render, lambda name, result: results.append(result), max_in_flight=2) as scheduler:
+            assert scheduler.submit('a', 1)
+            assert scheduler.submit('b', 1)
+            assert scheduler.submit('c', 1)
+            # 'a' is rendering, so these wait in its slot and only the newest survives
+            assert scheduler.submit('a', 2)
+            assert not scheduler.submit('a', 3)
+            assert not scheduler.submit('c', 2)
+            assert scheduler.in_flight == 2 and scheduler.queue_depth == 2
+            assert scheduler.stats.dropped == 2
+            assert RENDER_DROPPED.value(sensor='a') == dropped_before + 1
+            gate.set()
+            await asyncio.wait_for(scheduler.drain(), 5)
+            assert scheduler.queue_depth == 0 and scheduler.in_flight == 0
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert peak[0] == 2
+    assert sorted(results) == ['a:1', 'a:3', 'b:1', 'c:2']
+    assert [c for name, c in rendered if name == 'a'] == [1, 3]
+    assert scheduler.stats.submitted == 6 and scheduler.stats.rendered == 4
+    assert scheduler.stats.max_queue_depth == 2
+
+
+def test_scheduler_survives_failed_render():
+    def render(name, centroids):
+        if centroids is None:
+            raise ValueError('bad frame')
+        return centroids
+
+    async def scenario():
+        results = []
+        async with RenderScheduler(render, lambda name, result: results.append(result), max_in_flight=1) as scheduler:
+            scheduler.submit('a', None)
+            await scheduler.drain()
+            scheduler.submit('a', [(10, 12)])
+        return scheduler, results
+
+    scheduler, results = asyncio.run(scenario())
+    assert scheduler.stats.failed == 1 and results == [[(10, 12)]]
+
+
+def test_frame_server_renders_on_scheduler():
+    async def scenario():
+        server = FrameServer(port=0, render_workers=2)
+        server.scheduler.submit('InnoWing-9', [(26, 4)])
+        server.scheduler.submit('InnoWing-2', [(3, 7)])
+        await server.scheduler.drain()
+        await server.stop()
+        return server
+
+    server = asyncio.run(scenario())
+    assert set(server.frames) == {'InnoWing-9', 'InnoWing-2'}
+    assert all(frame.png.startswith(b'\x89PNG') and frame.seq == 1 for frame in server.frames.values())
+    # Sensors render on different workers, so each has its own renderer (and rng and stats)
+    assert set(server.renderers) == {'InnoWing-9', 'InnoWing-2'}
+    assert all(renderer.stats.frames_rendered == 1 for renderer in server.renderers.values())
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+import httpx
+import websockets
+
+from sensevis import SenseScraper
+
+
+def test_fetch_bbox_subscribes_after_registering():
+    async def scenario():
+        registered = []
+        subscribed = asyncio.Event()
+
+        async def handler(websocket):
+            registered.append(websocket.request.path)
+            await subscribed.wait()
+            await websocket.send(json.dumps({'payload': {'status': 'subscribed'}}))
+            await websocket.send(json.dumps({'payload': {'bboxes': [[1, 2, 26, 4, 0.8], [1, 2, 3, 7, 0.9]]}}))
+            await websocket.wait_closed()
+
+        def subscribe(request):
+            # The socket must already be registered when the subscription arrives
+            assert registered == ['/ws/register?clientId=python-client-InnoWing-9']
+            assert request.headers['X-Client-Id'] == 'python-client-InnoWing-9'
+            assert request.url.params['topic'] == 'senseai/InnoWing-9/tx'
+            subscribed.set()
+            return httpx.Response(200, json={'ok': True})
+
+        async with websockets.serve(handler, 'localhost', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            async with httpx.AsyncClient(transport=httpx.MockTransport(subscribe)) as client:
+                scraper = SenseScraper(api_url='http://sense.test', ws_url=f'ws://localhost:{port}',
+                                       http_client=client)
+                return await scraper.fetch_bbox(9, timeout=5)
+
+    assert asyncio.run(scenario()) == [[26, 4], [3, 7]]
@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+import pytest
+
+from sensevis._send import subscribe_many
+
+
+def test_subscribe_many_retries_and_reports_per_sensor():
+    calls = {}
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        sensor = request.headers['X-Client-Id'].removeprefix('python-client-')
+        calls[sensor] = calls.get(sensor, 0) + 1
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if sensor == 'InnoWing-2' and calls[sensor] == 1:
+            return httpx.Response(503)
+        if sensor == 'InnoWing-3':
+            return httpx.Response(404)
+        if sensor == 'InnoWing-4':
+            raise httpx.ConnectError('refused', request=request)
+        return httpx.Response(200)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            names = [f'InnoWing-{i}' for i in range(1, 9)]
+            return await subscribe_many(names, api_url='http://sense.test', concurrency=3,
+                                        attempts=3, backoff=0, client=client)
+
+    results = asyncio.run(scenario())
+    by_name = {r.sensor_name: r for r in results}
+    assert [r.sensor_name for r in results] == [f'InnoWing-{i}' for i in range(1, 9)]
+    assert by_name['InnoWing-1'].ok and by_name['InnoWing-1'].attempts == 1
+    assert by_name['InnoWing-2'].ok and by_name['InnoWing-2'].attempts == 2
+    assert not by_name['InnoWing-3'].ok and by_name['InnoWing-3'].attempts == 1
+    assert by_name['InnoWing-3'].status_code == 404
+    assert not by_name['InnoWing-4'].ok and by_name['InnoWing-4'].attempts == 3
+    assert by_name['InnoWing-4'].status_code is None and 'ConnectError' in by_name['InnoWing-4'].error
+    assert peak <= 3
+
+
+def test_subscribe_many_backoff_frees_slot_and_reports_last_attempt():
+    calls = {}
+
+    async def handler(request):
+        sensor = request.headers['X-Client-Id'].removeprefix('python-client-')
+        calls[sensor] = calls.get(sensor, 0) + 1
+        if sensor == 'InnoWing-1':
+            if calls[sensor] == 1:
+                return httpx.Response(503)
+            raise httpx.ConnectError('refused', request=request)
+        return httpx.Response(200)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await subscribe_many(['InnoWing-1', 'InnoWing-2'], api_url='http://sense.test', concurrency=1,
+                                        attempts=2, backoff=0.5, client=client)
+
+    failed, ok = asyncio.run(scenario())
+    # InnoWing-2 went out while InnoWing-1 was backing off, not after its retry
+    assert ok.ok and ok.elapsed < 0.4
+    assert not failed.ok and failed.attempts == 2
+    assert failed.status_code is None and 'ConnectError' in failed.error
+
+    with pytest.raises(ValueError):
+        asyncio.run(subscribe_many(['InnoWing-1'], attempts=0))
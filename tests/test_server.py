@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+import websockets
+
+from sensevis._post import IngestService
+from sensevis._server import FrameServer, _Listener
+
+
+def test_frame_server_against_fake_sensor_feed():
+    async def scenario():
+        send_next = asyncio.Event()
+
+        async def feed(websocket):
+            await websocket.send(json.dumps({'payload': {'bboxes': [[0, 0, 26, 4, 0.9]]}}))
+            await send_next.wait()
+            await websocket.send(json.dumps({'payload': {'bboxes': [[0, 0, 3, 7, 0.9]]}}))
+            await websocket.wait_closed()
+
+        async with websockets.serve(feed, 'localhost', 0) as fake:
+            ws_url = f"ws://localhost:{fake.sockets[0].getsockname()[1]}"
+            ingest = IngestService(['InnoWing-9'], ws_url=ws_url)
+            async with FrameServer(ingest, port=0) as server:
+                base = f'http://127.0.0.1:{server.port}'
+                async with httpx.AsyncClient(base_url=base, timeout=5) as client:
+                    async with client.stream('GET', '/events', params={'sensor': 'InnoWing-9'}) as events:
+                        assert events.headers['content-type'] == 'text/event-stream'
+                        lines = events.aiter_lines()
+                        first = await read_event(lines)
+                        assert first['sensor'] == 'InnoWing-9' and first['seq'] == 1
+
+                        png = await client.get('/sensor/InnoWing-9.png')
+                        assert png.status_code == 200 and png.content.startswith(b'\x89PNG')
+                        etag = png.headers['etag']
+                        cached = await client.get('/sensor/InnoWing-9.png', headers={'If-None-Match': etag})
+                        assert cached.status_code == 304 and cached.content == b''
+                        for tag in ('*', f'"other", W/{etag}'):
+                            cached = await client.get('/sensor/InnoWing-9.png', headers={'If-None-Match': tag})
+                            assert cached.status_code == 304
+
+                        send_next.set()
+                        second = await read_event(lines)
+                        assert second['seq'] == 2 and second['etag'] != etag
+
+                    fresh = await client.get('/sensor/InnoWing-9.png', headers={'If-None-Match': etag})
+                    assert fresh.status_code == 200
+                    assert (await client.get('/sensor/nope.png')).status_code == 404
+                    assert set((await client.get('/sensors')).json()) == {'InnoWing-9'}
+
+    asyncio.run(asyncio.wait_for(scenario(), 20))
+
+
+async def read_event(lines):
+    async for line in lines:
+        if line.startswith('data: '):
+            return json.loads(line[len('data: '):])
+
+
+def test_slow_event_listener_keeps_only_the_newest_frame_per_sensor():
+    async def scenario():
+        server = FrameServer(port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write(b'GET /events HTTP/1.1\r\n\r\n')
+        await writer.drain()
+        await reader.readuntil(b'\r\n\r\n')
+        while not server._listeners:
+            await asyncio.sleep(0.01)
+        listener = next(iter(server._listeners))
+        # Publish without yielding, as a burst of renders would: nothing is written in between
+        for i in range(1, 20):
+            server.publish('InnoWing-9', [(i % 32 + 1, 4)])
+            server.publish('InnoWing-2', [(3, i % 24 + 1)])
+        assert list(listener.pending) == ['InnoWing-9', 'InnoWing-2']
+        assert listener.pending['InnoWing-9'] is server.frames['InnoWing-9']
+        events = []
+        while len(events) < 2:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if line.startswith(b'data: '):
+                events.append(json.loads(line[len(b'data: '):]))
+        await server.stop()
+        writer.close()
+        return server, events
+
+    server, events = asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert [(e['sensor'], e['seq']) for e in events] == [(name, server.frames[name].seq)
+                                                         for name in ('InnoWing-9', 'InnoWing-2')]
+
+
+def test_closing_a_stalled_listener_aborts_its_connection():
+    class Transport:
+        aborted = False
+
+        def get_write_buffer_size(self):
+            return 1 << 20
+
+        def abort(self):
+            self.aborted = True
+
+    class Writer:
+        transport = Transport()
+
+    listener = _Listener(Writer())
+    listener.close()
+    assert listener.closed and listener.ready.is_set() and Writer.transport.aborted
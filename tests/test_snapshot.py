@@ -0,0 +1,43 @@
+from sensevis._snapshot import HEADER, NEW_FILE_MODE, SnapshotStore, atomic_write
+
+
+def test_publish_and_poll(tmp_path):
+    store = SnapshotStore(tmp_path)
+    assert store.header('InnoWing-9') is None
+    assert not store.changed('InnoWing-9', 0)
+
+    seq = store.publish('InnoWing-9', [[26, 4], [3, 7]], timestamp=100.0)
+    assert seq == 1
+    assert store.header('InnoWing-9') == (1, 100.0)
+    assert store.changed('InnoWing-9', 0)
+    assert not store.changed('InnoWing-9', 1)
+
+    snap = store.read('InnoWing-9')
+    assert snap.seq == 1 and snap.centroids == [[26.0, 4.0], [3.0, 7.0]]
+
+    store.publish('InnoWing-9', [])
+    assert store.read('InnoWing-9').centroids == []
+    assert store.path('InnoWing-9').stat().st_size == HEADER.size
+
+
+def test_sensors_are_independent_and_sequence_survives_restart(tmp_path):
+    store = SnapshotStore(tmp_path)
+    for i in range(50):
+        store.publish(f'InnoWing-{i}', [[i, i]])
+    store.publish('InnoWing-7', [[1, 1]])
+
+    reopened = SnapshotStore(tmp_path)
+    assert len(reopened.sensors()) == 50
+    assert reopened.read('InnoWing-3').centroids == [[3.0, 3.0]]
+    assert reopened.publish('InnoWing-7', [[2, 2]]) == 3
+    # No temp files are left behind
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith('.')]
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    path = tmp_path / 'data.json'
+    atomic_write(path, b'[]')
+    assert path.stat().st_mode & 0o777 == NEW_FILE_MODE
+    path.chmod(0o640)
+    atomic_write(path, b'[[26, 4]]')
+    assert path.stat().st_mode & 0o777 == 0o640 and path.read_bytes() == b'[[26, 4]]'
@@ -0,0 +1,50 @@
+import asyncio
+
+import numpy as np
+
+from sensevis._post import CentroidUpdate
+from sensevis._tracking import CentroidTracker, smooth_updates
+
+
+def test_tracker_suppresses_jitter_and_keeps_identity():
+    tracker = CentroidTracker(alpha=0.5, max_missed=1)
+    assert tracker.update([(5, 5), (25, 20)])
+
+    # Sub-cell jitter (a grid cell is ~3.3 x 3.3 live units) is smoothed away
+    assert not tracker.update([(5.6, 4.7), (24.5, 20.4)])
+    assert not tracker.update([(4.6, 5.3), (25.4, 19.6)])
+
+    # Detections arrive in the other order; ids follow the people, not the list position.
+    # Person 1 walks right and is emitted once the smoothed position is a full cell away.
+    assert not tracker.update([(25, 20), (9, 5)])
+    assert not tracker.update([(25, 20), (9, 5)])
+    assert tracker.update([(25, 20), (9, 5)])
+    assert tracker.track_ids.tolist() == [1, 2]
+    assert 8 < tracker.centroids[0][0] < 9
+
+    # A dropout survives max_missed frames, then the person is dropped
+    assert not tracker.update([(25, 20)])
+    assert tracker.update([(25, 20)])
+    assert tracker.track_ids.tolist() == [2]
+
+    # Someone new gets a fresh id; (0, 0) and empty frames count as nobody detected
+    assert tracker.update([(25, 20), (3, 20)])
+    assert tracker.track_ids.tolist() == [2, 3]
+    assert not tracker.update([[0, 0]])
+    assert tracker.update([])
+    assert tracker.centroids.shape == (0, 2)
+
+
+def test_smooth_updates_is_per_sensor():
+    async def source():
+        for name, centroids in [('a', [(5, 5)]), ('b', [(5, 5)]), ('a', [(5.3, 5.2)]), ('b', [(5, 5)]),
+                                ('a', [(13, 5)])]:
+            yield CentroidUpdate(name, np.array(centroids, dtype=float))
+
+    async def collect():
+        return [update async for update in smooth_updates(source(), max_distance=10)]
+
+    out = asyncio.run(collect())
+    assert [u.sensor_name for u in out] == ['a', 'b', 'a']
+    assert out[2].track_ids.tolist() == [1]
+    assert np.allclose(out[2].centroids, [[9.075, 5.05]])
@@ -0,0 +1,240 @@
+import random
+
+import numpy as np
+from PIL import Image
+
+from sensevis import _upscaler
+
+
+def blank_frame():
+    return np.zeros((_upscaler.GRID_H, _upscaler.GRID_W, 3), dtype=np.uint8)
+
+
+def test_single_person_halo_rings():
+    frame = blank_frame()
+    random.seed(0)
+    # Exactly on a grid cell -> one bright pixel at (4, 3)
+    _upscaler.draw_people(frame, np.array([4.0]), np.array([3.0]))
+
+    assert frame[3, 4].tolist() != [0, 0, 0]
+    for radius, weight in _upscaler.HALO_LAYERS:
+        for nx, ny in _upscaler.get_ring(4, 3, radius):
+            is_corner = abs(nx - 4) == radius and abs(ny - 3) == radius
+            alpha = weight * _upscaler.CORNER_FACTOR if is_corner else weight
+            if radius == 1:
+                assert any(
+                    frame[ny, nx].tolist() == list(_upscaler.blend(c, (0, 0, 0), alpha))
+                    for c in _upscaler.FADED_COLORS
+                )
+            else:
+                assert frame[ny, nx].tolist() == list(_upscaler.blend(_upscaler.LAYER2_COLOR, (0, 0, 0), alpha))
+
+
+def test_seeded_render_is_repeatable():
+    centroids = [(26, 4), (26, 14), (3, 7)]
+    frames = []
+    for _ in range(2):
+        random.seed(42)
+        frame = blank_frame()
+        _upscaler.draw_people(frame, *_upscaler.map_centroids(centroids))
+        frames.append(frame)
+    assert np.array_equal(frames[0], frames[1])
+
+
+def test_upscale_blocks_and_output_size():
+    frame = np.arange(_upscaler.GRID_H * _upscaler.GRID_W * 3, dtype=np.uint8).reshape(
+        _upscaler.GRID_H, _upscaler.GRID_W, 3)
+    up = _upscaler.upscale(frame)
+    assert up.shape == (_upscaler.UPSCALED_H, _upscaler.UPSCALED_W, 3)
+    assert (up[60:120, 128:192] == frame[1, 2]).all()
+
+    padded = _upscaler.upscale(frame, block_size=(2, 2), output_size=(30, 20))
+    assert padded.shape == (20, 30, 3)
+    assert (padded[16:, :] == 0).all() and (padded[:, 20:] == 0).all()
+    assert (padded[:2, :2] == frame[0, 0]).all()
+
+
+def test_save_upscaled_streams_to_file_object():
+    import io
+    from PIL import Image
+
+    frame = np.zeros((_upscaler.GRID_H, _upscaler.GRID_W, 3), dtype=np.uint8)
+    frame[0, 0] = (255, 0, 0)
+    buf = io.BytesIO()
+    _upscaler.save_upscaled(frame, buf, format='PNG')
+    img = Image.open(io.BytesIO(buf.getvalue()))
+    assert img.size == (_upscaler.UPSCALED_W, _upscaler.UPSCALED_H)
+    assert img.getpixel((63, 59)) == (255, 0, 0)
+    assert img.getpixel((64, 60)) == (0, 0, 0)
+
+
+def test_base_image_reloads_only_when_mtime_changes(tmp_path):
+    import os
+    from PIL import Image
+
+    path = tmp_path / 'base.png'
+    Image.new('RGB', (_upscaler.GRID_W, _upscaler.GRID_H), (1, 2, 3)).save(path)
+    base = _upscaler.BaseImage(path)
+
+    first = base.frame()
+    assert not first.flags.writeable
+    assert base.frame() is first
+    blank = base.blank_png()
+    assert base.blank_png() is blank
+
+    Image.new('RGB', (_upscaler.GRID_W, _upscaler.GRID_H), (9, 9, 9)).save(path)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert base.frame()[0, 0].tolist() == [9, 9, 9]
+    assert base.blank_png() != blank
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as fh:
+        for xs, ys in rows:
+            fh.write(f'{len(xs)},"{{{",".join(map(str, xs))}}}","[{",".join(map(str, ys))}]"\n')
+
+
+def test_batch_render_is_deterministic_across_worker_counts(tmp_path):
+    rng = random.Random(3)
+    rows = []
+    for _ in range(12):
+        n = rng.randint(0, 5)
+        rows.append(([round(rng.uniform(1, 100), 1) for _ in range(n)],
+                     [round(rng.uniform(1, 100), 1) for _ in range(n)]))
+    csv_path = tmp_path / 'centroid.csv'
+    write_csv(csv_path, rows)
+
+    serial, pooled = tmp_path / 'serial', tmp_path / 'pooled'
+    assert _upscaler.render_csv_batch(csv_path, serial, workers=0, seed=7, chunk_rows=5) == 12
+    assert _upscaler.render_csv_batch(csv_path, pooled, workers=2, seed=7, chunk_rows=5, max_pending=2) == 12
+
+    names = sorted(p.name for p in serial.iterdir())
+    assert names == sorted(p.name for p in pooled.iterdir())
+    assert {'1.png', '12.png', '100.png', '111.png'} <= set(names)
+    for name in names:
+        assert (serial / name).read_bytes() == (pooled / name).read_bytes()
+
+
+def test_incremental_renderer_skips_and_repaints_only_changed_cells():
+    renderer = _upscaler.IncrementalRenderer(rng=random.Random(0))
+    frame, upscaled, changed = renderer.render('InnoWing-9', [(1, 1)])
+    assert changed and renderer.stats.cells_rendered == _upscaler.GRID_W * _upscaler.GRID_H
+    first = frame.copy()
+
+    # Jitter that lands on the same bright pixel (with the same colour) is skipped entirely
+    _, _, changed = renderer.render('InnoWing-9', [(0.9, 0.95)])
+    assert not changed and renderer.stats.frames_skipped == 1
+
+    # A second person far away only repaints its own halo footprint
+    frame, upscaled, changed = renderer.render('InnoWing-9', [(1, 1), (32, 24)])
+    assert changed
+    assert 0 < renderer.stats.cells_rendered - _upscaler.GRID_W * _upscaler.GRID_H < _upscaler.GRID_W * _upscaler.GRID_H
+    assert np.array_equal(frame[:2, :2], first[:2, :2])
+    assert np.array_equal(upscaled, _upscaler.upscale(frame))
+
+    # Layer structure matches a full render of the same centroids
+    full = _upscaler.render_frame([(1, 1), (32, 24)], rng=random.Random(1))
+    static = _upscaler.halo_layout(*_upscaler.bright_cells(*_upscaler.map_centroids([(1, 1), (32, 24)])))
+    not_ring1 = static.layer != 1
+    assert np.array_equal(frame[not_ring1], full[not_ring1])
+
+    # Sensors are tracked independently
+    _, _, changed = renderer.render('InnoWing-10', [(1, 1)])
+    assert changed
+    assert renderer.stats.frames_rendered == 3
+
+
+def test_render_configs_side_by_side(tmp_path):
+    from PIL import Image
+
+    # Whole-number coordinates go through the lookup tables; the result matches the computed path
+    rng = random.Random(5)
+    centroids = [(rng.randint(1, 32), rng.randint(1, 24)) for _ in range(6)]
+    looked_up = _upscaler.centroid_cells(centroids)
+    computed = _upscaler.bright_cells(*_upscaler.map_centroids(centroids))
+    for a, b in zip(looked_up, computed):
+        assert np.array_equal(a, b)
+
+    dense = _upscaler.RenderConfig(grid_size=(20, 16), coord_range=((0, 63), (0, 47)), output_size=(1280, 960),
+                                   palette=_upscaler.Palette(bright=(255, 0, 0), edge=(255, 0, 0)))
+    assert dense.block_size == (64, 60)
+    assert dense.halo_kernels.shape == (16, 20, 16, 20)
+
+    path = tmp_path / 'base.png'
+    Image.new('RGB', (10, 8), (0, 0, 0)).save(path)
+    base = _upscaler.BaseImage(path, dense)
+    assert base.frame().shape == (16, 20, 3)
+    frame = _upscaler.render_frame([(63, 47)], base, rng=random.Random(0))
+    assert frame[15, 19].tolist() == [255, 0, 0]
+    assert frame[7, 9].tolist() == [0, 0, 0]
+
+    # The default config is untouched and both can be used from the same renderer process
+    renderer = _upscaler.IncrementalRenderer(base, rng=random.Random(0))
+    _, upscaled, _ = renderer.render('Dense-1', [(63, 47)])
+    assert upscaled.shape == (960, 1280, 3)
+    assert np.array_equal(upscaled, dense.upscale(frame))
+    assert _upscaler.render_frame([(32, 24)], rng=random.Random(0)).shape == (_upscaler.GRID_H, _upscaler.GRID_W, 3)
+    assert len(_upscaler.encode_frame(frame, 'raw', config=dense)) == 1280 * 960 * 3
+
+
+def legacy_draw(pixels, points):
+    """The original per-pixel renderer: one bright set for `points` (grid floats), then 4 halo rings."""
+    u = _upscaler
+    cx, cy = (u.GRID_W - 1) / 2, (u.GRID_H - 1) / 2
+    max_dist = (cx ** 2 + cy ** 2) ** 0.5
+    bright = set()
+    for sx, sy in points:
+        px0, py0 = int(min(u.GRID_W - 1, sx)), int(min(u.GRID_H - 1, sy))
+        px1, py1 = min(px0 + 1, u.GRID_W - 1), min(py0 + 1, u.GRID_H - 1)
+        dx, dy = sx - px0, sy - py0
+        norm = min(((sx - cx) ** 2 + (sy - cy) ** 2) ** 0.5 / max_dist, 1.0)
+        color = u.blend(u.BRIGHT_COLOR, u.BASE_YELLOW, 1 - norm)
+        for cell, w in (((px0, py0), (1 - dx) * (1 - dy)), ((px1, py0), dx * (1 - dy)),
+                        ((px0, py1), (1 - dx) * dy), ((px1, py1), dx * dy)):
+            if w >= 0.1:
+                pixels[cell] = color
+                bright.add(cell)
+    done = set(bright)
+    blends = (u.LAYER1_BLEND, u.LAYER2_BLEND, u.LAYER3_BLEND, u.LAYER4_BLEND)
+    for radius, alpha in enumerate(blends, start=1):
+        ring = set()
+        for bp in bright:
+            ring.update(u.get_ring(*bp, radius=radius))
+        for nx, ny in ring:
+            if (nx, ny) in done:
+                continue
+            corner = any(abs(nx - bx) == radius and abs(ny - by) == radius for bx, by in bright)
+            a = alpha * u.CORNER_FACTOR if corner else alpha
+            overlay = random.choice(u.FADED_COLORS) if radius == 1 else u.LAYER2_COLOR
+            pixels[nx, ny] = u.blend(overlay, pixels[nx, ny], a)
+        done |= ring
+
+
+def test_matches_legacy_per_pixel_renderer():
+    base = _upscaler.BaseImage()
+    rng = random.Random(1)
+    for trial in range(150):
+        n = rng.randint(0, 12)
+        centroids = [(rng.uniform(0, 33), rng.uniform(0, 25)) if rng.random() < .7
+                     else (rng.randint(1, 32), rng.randint(1, 24)) for _ in range(n)]
+        img = Image.fromarray(base.frame())
+        random.seed(trial)
+        if not _upscaler.is_blank(centroids):
+            legacy_draw(img.load(), [((x - 1) / 31 * (_upscaler.GRID_W - 1), (y - 1) / 23 * (_upscaler.GRID_H - 1))
+                                     for x, y in centroids])
+        random.seed(trial)
+        assert np.array_equal(_upscaler.render_frame(centroids, base), np.asarray(img)), centroids
+
+    # CSV rows (1..100) draw and halo each person on top of the previous ones
+    for trial in range(60):
+        n = rng.randint(0, 8)
+        xs = [round(rng.uniform(1, 100), 2) for _ in range(n)]
+        ys = [round(rng.uniform(1, 100), 2) for _ in range(n)]
+        img = Image.fromarray(base.frame())
+        random.seed(trial)
+        for x, y in zip(xs, ys):
+            legacy_draw(img.load(), [((x - 1) / _upscaler.COORD_MAX * _upscaler.GRID_W,
+                                      (y - 1) / _upscaler.COORD_MAX * _upscaler.GRID_H)])
+        random.seed(trial)
+        assert np.array_equal(_upscaler.render_csv_frame(base.frame(), xs, ys), np.asarray(img)), (xs, ys)